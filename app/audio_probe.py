@@ -0,0 +1,115 @@
+"""
+Fast audio metadata probe.
+
+This module reads the duration and codec of an audio file from its container
+headers, without opening a decoder, so the configuration can be checked
+against the audio length before any rendering starts.
+"""
+
+import functools
+import logging
+import os
+import re
+import subprocess
+import wave
+
+import ffmpeg_encoder
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_AUDIO_STREAM_PATTERN = re.compile(
+    r"Stream #\d+:\d+.*?: Audio: (\w+).*?(\d+) Hz, ([^,]+)"
+)
+
+
+class AudioProbeError(Exception):
+    """Custom exception for audio files whose metadata cannot be read."""
+
+    pass
+
+
+def _probe_wave(audio_path: str) -> dict:
+    """Reads the metadata of a WAV file from its header."""
+    with wave.open(audio_path, "rb") as fp:
+        sample_rate = fp.getframerate()
+        return {
+            "duration": fp.getnframes() / sample_rate,
+            "codec": "pcm",
+            "sample_rate": sample_rate,
+            "channels": fp.getnchannels(),
+        }
+
+
+def _probe_ffmpeg(audio_path: str) -> dict:
+    """Reads the metadata of an audio file from the ffmpeg header dump."""
+    result = subprocess.run(
+        [ffmpeg_encoder.get_ffmpeg_binary(), "-hide_banner", "-i", audio_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    # ffmpeg exits with an error as no output file is given; only stderr matters
+    info = result.stderr.decode(errors="replace")
+    duration_match = _DURATION_PATTERN.search(info)
+    stream_match = _AUDIO_STREAM_PATTERN.search(info)
+    if not duration_match or not stream_match:
+        raise AudioProbeError(f"Could not read audio metadata of: {audio_path}")
+
+    hours, minutes, seconds = duration_match.groups()
+    channels = stream_match.group(3).strip()
+    return {
+        "duration": int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        "codec": stream_match.group(1),
+        "sample_rate": int(stream_match.group(2)),
+        "channels": {"mono": 1, "stereo": 2}.get(channels, channels),
+    }
+
+
+@functools.lru_cache(maxsize=256)
+def _probe_audio(audio_path: str, mtime_ns: int, size: int) -> dict:
+    """Probes an audio file (cached by path, mtime and size)."""
+    if audio_path.lower().endswith(".wav"):
+        try:
+            return _probe_wave(audio_path)
+        except wave.Error:
+            pass  # e.g. compressed WAV, let ffmpeg read it
+    return _probe_ffmpeg(audio_path)
+
+
+def probe_audio(audio_path: str) -> dict:
+    """
+    Reads the metadata of an audio file from its container headers.
+
+    Results are cached until the file's modification time or size changes.
+
+    Args:
+        audio_path: The path to the audio file.
+
+    Returns:
+        A dictionary with the "duration" (in seconds), "codec",
+        "sample_rate" and "channels" of the audio.
+
+    Raises:
+        FileNotFoundError: If the audio file does not exist.
+        AudioProbeError: If the metadata cannot be read.
+    """
+    if not os.path.isfile(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    stat = os.stat(audio_path)
+    info = _probe_audio(os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size)
+    logger.debug(f"{Status.OK} Audio metadata of {audio_path}: {info}")
+    return dict(info)
+
+
+def get_audio_duration(audio_path: str) -> float:
+    """
+    Returns the duration of an audio file, read from its container headers.
+
+    Args:
+        audio_path: The path to the audio file.
+
+    Returns:
+        The duration in seconds.
+    """
+    return probe_audio(audio_path)["duration"]
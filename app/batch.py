@@ -0,0 +1,299 @@
+"""
+Batch runner for many configuration files.
+
+This module runs the image and video stages of many jobs on one shared pool
+of warm worker processes (fonts and the video libraries are loaded once per
+worker), limits encoder threads so the host is not oversubscribed, and writes
+a per-job summary of status and timings.
+
+Usage:
+    python batch.py <folder or manifest.txt> [image] [video] [--jobs=N] [--summary=path]
+
+A manifest is a text file listing one configuration file per line
+(relative to the manifest); lines starting with '#' are ignored.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+import image
+import main
+import validation
+from utils import Status, apply_config_settings, get_config_settings
+
+logger = logging.getLogger("AudioVideoMaker.batch")
+
+STAGES = ("image", "video")
+
+
+def find_config_files(source: str) -> list[str]:
+    """
+    Lists the configuration files of a batch.
+
+    Args:
+        source: A folder (searched recursively for .yaml/.yml files)
+            or a manifest file listing configuration files.
+
+    Returns:
+        A sorted list of configuration file paths.
+
+    Raises:
+        FileNotFoundError: If the source does not exist.
+    """
+    if os.path.isdir(source):
+        config_paths = []
+        for folder, _, filenames in os.walk(source):
+            config_paths.extend(
+                os.path.join(folder, name)
+                for name in filenames
+                if name.endswith((".yaml", ".yml"))
+            )
+        return sorted(config_paths)
+
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"Batch folder or manifest not found: {source}")
+    manifest_folder = os.path.dirname(source)
+    with open(source, "rt", encoding="utf8") as fp:
+        lines = [line.strip() for line in fp]
+    return [
+        os.path.join(manifest_folder, line)
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def _init_batch_worker(settings: dict, threads: int) -> None:
+    """
+    Initializes a batch worker process and warms up its fonts and libraries.
+
+    Args:
+        settings: The config settings of the parent process.
+        threads: The number of encoder threads the worker may use.
+    """
+    apply_config_settings(settings)
+    config.IMAGE_RENDER_WORKERS = 1
+    config.VIDEO_ENCODE_JOBS = 1
+    config.VIDEO_ENCODE_THREADS = threads
+    image.get_font()
+    # Imported once per worker, so jobs do not pay for loading the video libraries
+    import video  # noqa: F401
+
+
+def _redirect_outputs(config_info: validation.GetConfig, output_folder: str) -> None:
+    """
+    Points a job's images and video to a folder of their own, keeping their
+    paths relative to the configuration file.
+
+    Args:
+        config_info: The validated configuration (updated in place).
+        output_folder: The folder to write the images and video to.
+    """
+
+    def redirect(path: str) -> str:
+        relative_path = os.path.relpath(path, config_info.folder_path)
+        output_path = os.path.join(output_folder, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        return output_path
+
+    config_info.image_names = [redirect(path) for path in config_info.image_names]
+    config_info.video_file_path = redirect(config_info.video_file_path)
+
+
+def _run_stage(config_path: str, stage: str, output_folder: str | None = None) -> dict:
+    """
+    Runs one stage of a job in a batch worker.
+
+    Args:
+        config_path: The path to the job's configuration file.
+        stage: The stage to run ("image" or "video").
+        output_folder: A folder to write the job's images and video to,
+            instead of next to the configuration file.
+
+    Returns:
+        A dictionary with the stage's duration ("seconds"), the video
+        output path ("output") and an error message ("error", or None).
+    """
+    start_time = time.perf_counter()
+    outcome = {"seconds": 0.0, "output": None, "error": None}
+    try:
+        config_info = validation.GetConfig(config_path)
+        if output_folder:
+            _redirect_outputs(config_info, output_folder)
+        outcome["output"] = config_info.video_file_path
+        main.main(
+            config=config_info,
+            generate_image=stage == "image",
+            generate_video=stage == "video",
+        )
+    except Exception as err:
+        outcome["error"] = f"{type(err).__name__}: {err}"
+    outcome["seconds"] = round(time.perf_counter() - start_time, 3)
+    return outcome
+
+
+def run_batch(
+    config_paths: list[str],
+    stages: tuple[str, ...] = STAGES,
+    jobs: int | None = None,
+) -> list[dict]:
+    """
+    Runs many jobs on a shared pool of worker processes.
+
+    Each job's stages run in order, while stages of different jobs run
+    concurrently; e.g. one job's video is encoded while the next job's
+    images are rendered. Jobs in the same folder share image file names
+    (e.g. `text_image_1.png`), so they run one after another. If a worker
+    process dies (e.g. out of memory), the pool cannot run any more stages,
+    so the jobs that did not finish are marked as failed.
+
+    Args:
+        config_paths: The paths to the jobs' configuration files.
+        stages: The stages to run for each job ("image" and/or "video").
+        jobs: The number of worker processes. Defaults to the number of
+            CPU cores (but not more than the number of job folders).
+
+    Returns:
+        A list of per-job summaries with status, timings and output path.
+    """
+    folder_queues: dict[str, deque] = {}
+    for path in config_paths:
+        folder = os.path.dirname(os.path.abspath(path))
+        folder_queues.setdefault(folder, deque()).append(path)
+
+    cpu_count = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cpu_count, len(folder_queues)))
+    # Share the cores between the encoders running at the same time
+    threads = max(1, cpu_count // jobs)
+    logger.info(
+        f"{Status.WIP} Running {len(config_paths)} jobs on {jobs} workers "
+        f"({threads} encoder threads each)"
+    )
+
+    summaries = {
+        path: {"config": path, "status": "pending", "output": None, "timings": {}}
+        for path in config_paths
+    }
+    if not config_paths or not stages:
+        return list(summaries.values())
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_batch_worker,
+        initargs=(get_config_settings(), threads),
+    ) as executor:
+        pending = {}
+
+        def fail_job(path: str, error: str) -> None:
+            """Records a failed job."""
+            summaries[path]["status"] = "failed"
+            summaries[path]["error"] = error
+            logger.error(f"{Status.NOT_OK} {path}: {error}")
+
+        def submit_stage(path: str, stage_index: int) -> bool:
+            """Submits a stage of a job; fails the job if the pool is broken."""
+            try:
+                future = executor.submit(_run_stage, path, stages[stage_index])
+            except BrokenProcessPool as err:
+                fail_job(path, f"{type(err).__name__}: {err}")
+                return False
+            pending[future] = (path, stage_index)
+            return True
+
+        def submit_next_job(folder: str) -> None:
+            """Submits the first stage of the folder's next job, if any."""
+            while folder_queues[folder]:
+                if submit_stage(folder_queues[folder].popleft(), 0):
+                    return
+
+        for folder in folder_queues:
+            submit_next_job(folder)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, stage_index = pending.pop(future)
+                summary = summaries[path]
+                try:
+                    outcome = future.result()
+                except Exception as err:
+                    # e.g. BrokenProcessPool if a worker was killed (out of memory);
+                    # the jobs left are then failed without running
+                    outcome = {
+                        "seconds": 0.0,
+                        "output": summary["output"],
+                        "error": f"{type(err).__name__}: {err}",
+                    }
+                summary["timings"][stages[stage_index]] = outcome["seconds"]
+                summary["output"] = outcome["output"]
+                if outcome["error"]:
+                    fail_job(path, outcome["error"])
+                    submit_next_job(os.path.dirname(os.path.abspath(path)))
+                elif stage_index + 1 < len(stages):
+                    if not submit_stage(path, stage_index + 1):
+                        submit_next_job(os.path.dirname(os.path.abspath(path)))
+                else:
+                    summary["status"] = "ok"
+                    logger.info(f"{Status.OK} {path} done")
+                    submit_next_job(os.path.dirname(os.path.abspath(path)))
+
+    return list(summaries.values())
+
+
+def write_summary(summaries: list[dict], summary_path: str, total_secs: float) -> None:
+    """
+    Writes the batch summary to a JSON file and prints it as a table.
+
+    Args:
+        summaries: The per-job summaries returned by `run_batch`.
+        summary_path: The path to write the JSON summary to.
+        total_secs: The wall time of the whole batch (in seconds).
+    """
+    with open(summary_path, "wt", encoding="utf8") as fp:
+        json.dump({"total_secs": round(total_secs, 3), "jobs": summaries}, fp, indent=2)
+
+    print(f"{'status':<8} {'image (s)':>10} {'video (s)':>10}  config")
+    for summary in summaries:
+        timings = summary["timings"]
+        print(
+            f"{summary['status']:<8} {timings.get('image', 0):>10.2f} "
+            f"{timings.get('video', 0):>10.2f}  {summary['config']}"
+        )
+    print(f"{Status.OK} Batch finished in {total_secs:.2f} secs: {summary_path}")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(
+        arg[2:].partition("=")[::2] for arg in sys.argv[1:] if arg.startswith("--")
+    )
+    sources = [arg for arg in args if arg not in STAGES]
+    if not sources:
+        logger.error("Missing batch folder or manifest file!")
+        sys.exit(1)
+
+    stages = tuple(stage for stage in STAGES if stage in args) or STAGES
+    try:
+        paths = find_config_files(sources[0])
+    except FileNotFoundError as e:
+        logger.error(e)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_batch(
+        paths, stages, jobs=int(options["jobs"]) if "jobs" in options else None
+    )
+    source_folder = (
+        sources[0] if os.path.isdir(sources[0]) else os.path.dirname(sources[0])
+    )
+    write_summary(
+        results,
+        options.get("summary") or os.path.join(source_folder, "batch_summary.json"),
+        time.perf_counter() - start,
+    )
+    sys.exit(0 if all(result["status"] == "ok" for result in results) else 1)
@@ -0,0 +1,387 @@
+"""
+Benchmark suite.
+
+This module generates synthetic jobs (configuration, slide texts and an audio
+stand-in made with ffmpeg) at several scales and image resolutions, times each
+stage of the pipeline, writes the timings to a JSON file and compares them
+against a stored baseline.
+
+Usage:
+    python benchmark.py [--slides=10,100,1000] [--resolutions=1024x720,1920x1350]
+        [--output=benchmark_results.json] [--baseline=path] [--tolerance=0.1]
+        [--encoder=moviepy] [--max-encode-slides=100] [--repeat=1]
+        [--formats=png,png-palette,bmp]
+
+Each job also renders its slides in each image output format, recording the
+render-and-save time and the total size of the images ("formats").
+"""
+
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import yaml
+
+import config
+import ffmpeg_encoder
+import image
+import layout
+import validation
+from utils import Status, override_config_settings
+
+logging.basicConfig(level=logging.WARNING, format="%(message)s")
+logger = logging.getLogger("AudioVideoMaker.benchmark")
+logger.setLevel(logging.INFO)
+
+SLIDE_COUNTS = (10, 100, 1000)
+RESOLUTIONS = ((1024, 720), (1920, 1350))
+SECONDS_PER_SLIDE = 2
+STAGES = ("validation", "text_layout", "render", "clips", "encode")
+
+# Timing differences below this many seconds are treated as noise
+NOISE_FLOOR_SECS = 0.05
+
+_WORDS = (
+    "audio video slide text render frame timeline encode font line "
+    "image color voice story music chapter title credits thank you"
+).split()
+
+
+def generate_audio(audio_path: str, seconds: float) -> None:
+    """
+    Generates an audio stand-in (a sine tone) with ffmpeg.
+
+    Args:
+        audio_path: The path to write the audio file to (e.g. "audio.mp3").
+        seconds: The duration of the audio.
+    """
+    ffmpeg_encoder.run_ffmpeg(
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+            audio_path,
+        ]
+    )
+
+
+def generate_slide_text(rng: random.Random) -> str:
+    """
+    Generates a random slide text within the configured line limits.
+
+    Args:
+        rng: The random number generator to use.
+
+    Returns:
+        The slide text.
+    """
+    lines = []
+    for _ in range(rng.randint(1, min(8, config.IMAGE_TEXT_MAX_LINES_LIMIT))):
+        line = ""
+        while True:
+            word = rng.choice(_WORDS)
+            if len(line) + len(word) + 1 > config.IMAGE_TEXT_MAX_LINE_CHAR_LIMIT:
+                break
+            line = f"{line} {word}".strip()
+        lines.append(line if rng.random() > 0.2 else "")
+    return "\n".join(lines)
+
+
+def generate_config(folder: str, slides: int, seed: int = 0) -> str:
+    """
+    Generates a synthetic job: a configuration file and its audio stand-in.
+
+    The audio is shared by all jobs of the same length in the folder.
+
+    Args:
+        folder: The folder to write the job to.
+        slides: The number of slides.
+        seed: The seed of the slide texts.
+
+    Returns:
+        The path to the configuration file.
+    """
+    rng = random.Random(seed)
+    audio_name = f"audio_{slides}.mp3"
+    audio_path = os.path.join(folder, audio_name)
+    if not os.path.isfile(audio_path):
+        generate_audio(audio_path, slides * SECONDS_PER_SLIDE)
+
+    job = {
+        "audio": audio_name,
+        "video": f"video_{slides}.mp4",
+        "images": [
+            {"duration": SECONDS_PER_SLIDE, "text": generate_slide_text(rng)}
+            for _ in range(slides)
+        ],
+    }
+    config_path = os.path.join(folder, f"config_{slides}.yaml")
+    with open(config_path, "wt", encoding="utf8") as fp:
+        yaml.safe_dump(job, fp, sort_keys=False)
+    return config_path
+
+
+def _time(function, repeat: int) -> float:
+    """Returns the fastest wall time of `repeat` calls, in seconds."""
+    timings = []
+    for _ in range(max(repeat, 1)):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return round(min(timings), 4)
+
+
+def benchmark_job(
+    config_path: str,
+    encoder: str | None = None,
+    encode: bool = True,
+    repeat: int = 1,
+) -> dict[str, float]:
+    """
+    Times each stage of the pipeline for one job.
+
+    Args:
+        config_path: The path to the job's configuration file.
+        encoder: The video encoder backend. Defaults to `VIDEO_ENCODER`.
+        encode: Whether to time the video encoding.
+        repeat: The number of runs of each stage (the fastest is kept).
+
+    Returns:
+        A dictionary of stage timings in seconds.
+    """
+    # Imported here as moviepy is slow to import
+    import video
+
+    timings = {}
+    timings["validation"] = _time(lambda: validation.GetConfig(config_path), repeat)
+    config_info = validation.GetConfig(config_path)
+    texts = config_info.txt_image_text
+
+    def layout_texts() -> None:
+        font = image.get_font()
+        for text in texts:
+            layout.layout_text(text, font)
+
+    def render_images() -> None:
+        font = image.get_font()
+        for text, path in zip(texts, config_info.txt_image_names):
+            image.generate_text_image(text, path, font=font)
+
+    timings["text_layout"] = _time(layout_texts, repeat)
+    timings["render"] = _time(render_images, repeat)
+    timings["clips"] = _time(
+        lambda: video.get_multiple_image_clips(
+            config_info.txt_image_names,
+            config_info.txt_image_durations,
+            config_info.audio_duration,
+        ),
+        repeat,
+    )
+    if encode:
+        timings["encode"] = _time(
+            lambda: video.generate_video_with_audio(
+                images=config_info.txt_image_names,
+                durations=config_info.txt_image_durations,
+                audio_path=config_info.audio_file_path,
+                output_path=config_info.video_file_path,
+                encoder=encoder or config.VIDEO_ENCODER,
+            ),
+            repeat,
+        )
+    return timings
+
+
+def benchmark_output_formats(
+    config_path: str, formats: tuple[str, ...], repeat: int = 1
+) -> dict[str, dict]:
+    """
+    Times rendering and saving a job's slides in each image output format.
+
+    Args:
+        config_path: The path to the job's configuration file.
+        formats: The image output formats (see `IMAGE_OUTPUT_FORMATS`).
+        repeat: The number of runs of each format (the fastest is kept).
+
+    Returns:
+        A dictionary of the render time in seconds ("render") and the total
+        size of the images in bytes ("bytes"), by format.
+    """
+    results = {}
+    for output_format in formats:
+        with override_config_settings({"IMAGE_OUTPUT_FORMAT": output_format}):
+            config_info = validation.GetConfig(config_path)
+            texts = config_info.txt_image_text
+            paths = config_info.txt_image_names
+
+            def render_images() -> None:
+                font = image.get_font()
+                for text, path in zip(texts, paths):
+                    image.generate_text_image(text, path, font=font)
+
+            results[output_format] = {
+                "render": _time(render_images, repeat),
+                "bytes": sum(os.path.getsize(path) for path in set(paths)),
+            }
+    return results
+
+
+def run_benchmarks(
+    slide_counts: tuple[int, ...] = SLIDE_COUNTS,
+    resolutions: tuple[tuple[int, int], ...] = RESOLUTIONS,
+    encoder: str | None = None,
+    max_encode_slides: int = 100,
+    repeat: int = 1,
+    formats: tuple[str, ...] = config.IMAGE_OUTPUT_FORMATS,
+) -> dict:
+    """
+    Runs the benchmark suite on synthetic jobs.
+
+    Args:
+        slide_counts: The numbers of slides of the jobs.
+        resolutions: The image dimensions (width, height) to render at.
+        encoder: The video encoder backend. Defaults to `VIDEO_ENCODER`.
+        max_encode_slides: Jobs with more slides skip the encoding stage.
+        repeat: The number of runs of each stage (the fastest is kept).
+        formats: The image output formats to compare (none if empty).
+
+    Returns:
+        The results: host information ("meta"), the stage timings of each
+        job ("results") and the render time and image size of each job in
+        each output format ("formats"), keyed by "<slides>x<width>x<height>".
+    """
+    encoder = encoder or config.VIDEO_ENCODER
+    dimension = config.IMAGE_DIMENSION
+    results = {}
+    format_results = {}
+    # Validation is timed without the config cache, which would also keep
+    # entries for the temporary jobs
+    with override_config_settings(
+        {"CONFIG_CACHE_ENABLED": False}
+    ), tempfile.TemporaryDirectory(prefix="a2v_benchmark_") as folder:
+        for slides in slide_counts:
+            config_path = generate_config(folder, slides)
+            for width, height in resolutions:
+                name = f"{slides}x{width}x{height}"
+                logger.info(f"{Status.WIP} Benchmarking {name}...")
+                config.IMAGE_DIMENSION = (width, height)
+                try:
+                    results[name] = benchmark_job(
+                        config_path,
+                        encoder=encoder,
+                        encode=slides <= max_encode_slides,
+                        repeat=repeat,
+                    )
+                    if formats:
+                        format_results[name] = benchmark_output_formats(
+                            config_path, formats, repeat=repeat
+                        )
+                finally:
+                    config.IMAGE_DIMENSION = dimension
+                logger.info(f"{Status.OK} {name}: {results[name]}")
+                for output_format, result in format_results.get(name, {}).items():
+                    logger.info(
+                        f"{Status.OK} {name} {output_format}: {result['render']}s, "
+                        f"{result['bytes'] / 2**20:.1f} MiB"
+                    )
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "encoder": encoder,
+            "repeat": repeat,
+        },
+        "results": results,
+        "formats": format_results,
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = 0.1) -> bool:
+    """
+    Compares benchmark results against a baseline and prints the differences.
+
+    Args:
+        results: The results returned by `run_benchmarks`.
+        baseline: Results of an earlier run.
+        tolerance: The allowed slowdown ratio (0.1 allows 10% slower).
+
+    Returns:
+        True if no stage got slower than the tolerance allows.
+    """
+    passed = True
+    print(f"{'job':<18} {'stage':<12} {'baseline':>9} {'current':>9} {'change':>8}")
+    for name, timings in results["results"].items():
+        baseline_timings = baseline.get("results", {}).get(name, {})
+        for stage in STAGES:
+            if stage not in timings or stage not in baseline_timings:
+                continue
+            before, after = baseline_timings[stage], timings[stage]
+            change = (after - before) / before if before else 0.0
+            regressed = change > tolerance and after - before > NOISE_FLOOR_SECS
+            passed = passed and not regressed
+            print(
+                f"{name:<18} {stage:<12} {before:>9.3f} {after:>9.3f} "
+                f"{change:>+7.0%}{' !' if regressed else ''}"
+            )
+    return passed
+
+
+if __name__ == "__main__":
+    options = {
+        name.replace("-", "_"): value
+        for name, _, value in (
+            arg[2:].partition("=") for arg in sys.argv[1:] if arg.startswith("--")
+        )
+    }
+    results = run_benchmarks(
+        slide_counts=(
+            tuple(int(count) for count in options["slides"].split(","))
+            if options.get("slides")
+            else SLIDE_COUNTS
+        ),
+        resolutions=(
+            tuple(
+                tuple(int(size) for size in resolution.split("x"))
+                for resolution in options["resolutions"].split(",")
+            )
+            if options.get("resolutions")
+            else RESOLUTIONS
+        ),
+        encoder=options.get("encoder") or None,
+        max_encode_slides=(
+            int(options["max_encode_slides"])
+            if options.get("max_encode_slides")
+            else 100
+        ),
+        repeat=int(options.get("repeat") or 1),
+        formats=(
+            tuple(filter(None, options["formats"].split(",")))
+            if "formats" in options
+            else config.IMAGE_OUTPUT_FORMATS
+        ),
+    )
+
+    output_path = options.get("output") or "benchmark_results.json"
+    with open(output_path, "wt", encoding="utf8") as fp:
+        json.dump(results, fp, indent=2)
+    logger.info(f"{Status.OK} Benchmark results written to: {output_path}")
+
+    baseline_path = options.get("baseline")
+    if baseline_path:
+        if not os.path.isfile(baseline_path):
+            logger.warning(f"{Status.WARNING} Baseline not found: {baseline_path}")
+            sys.exit()
+        with open(baseline_path, "rt", encoding="utf8") as fp:
+            baseline = json.load(fp)
+        passed = compare_results(
+            results, baseline, tolerance=float(options.get("tolerance") or 0.1)
+        )
+        sys.exit(0 if passed else 1)
@@ -58,6 +58,9 @@ colors = {
 FONT_PATH = os.path.join("font", "Tinos", "Tinos-Regular.ttf")
 # FONT_SIZE = 62
 FONT_SIZE = 42
+# Font variant (e.g. "Bold", "Italic") loaded from the same folder as FONT_PATH,
+# e.g. "Tinos-Bold.ttf". None uses FONT_PATH as it is.
+FONT_VARIANT = None
 
 # --- Image Settings ---
 # Dimensions of the generated images (width, height).
@@ -74,9 +77,147 @@ IMAGE_TEXT_COLOR = colors["white"]
 IMAGE_BACKGROUND_COLOR = colors["navy"]  # "rgb(0, 0, 162)"  # Dark blue background
 
 # Text
+# Lines are measured in pixels and centered vertically in the image. Lines wider
+# than the image (minus padding) are wrapped at spaces if IMAGE_TEXT_WRAP is set.
+IMAGE_TEXT_ALIGNMENTS = ("left", "center")
+IMAGE_TEXT_ALIGN = "left"  # "center" centers each line by its width
+IMAGE_TEXT_WRAP = False
+# Approximate text capacity of a slide, used to generate test and benchmark texts
 IMAGE_TEXT_MAX_LINE_CHAR_LIMIT = 45  # Maximum characters per line
 IMAGE_TEXT_MAX_LINES_LIMIT = 16  # Maximum number of lines
 
+# Number of worker processes used to render images (1 renders in-process).
+IMAGE_RENDER_WORKERS = 1
+
+# Render slides that repeat the same text (e.g. choruses) once: repeated slides
+# point to the first slide's image, and the video stage decodes it only once.
+# Slides with an explicit 'name' in the configuration file keep their own image.
+IMAGE_DEDUPLICATE = True
+
+# File format of the slide images.
+# "png" saves RGB PNG files. "png-palette" saves 8-bit palette PNG files, whose
+# 256 colors are the blends between IMAGE_BACKGROUND_COLOR and IMAGE_TEXT_COLOR
+# (the only colors a slide contains): they compress faster and are about a
+# third of the size. "bmp" saves uncompressed files, fastest to write and read
+# but much larger, e.g. for images only used as an intermediate step.
+IMAGE_OUTPUT_FORMATS = ("png", "png-palette", "bmp")
+IMAGE_OUTPUT_FORMAT = "png"
+# File extension of the default image names, by format
+IMAGE_OUTPUT_EXTENSIONS = {"png": ".png", "png-palette": ".png", "bmp": ".bmp"}
+# zlib level of PNG files, from 0 (no compression, fastest) to 9 (smallest)
+IMAGE_PNG_COMPRESS_LEVEL = 6
+
+# When generating images and video in one run, hand the rendered images to the
+# video stage in memory instead of writing and reading back PNG files.
+PIPELINE_IN_MEMORY = False
+
+# When generating images and video in one run, stream each slide to ffmpeg as
+# soon as it is rendered, so encoding overlaps with rendering. At most
+# STREAM_QUEUE_SIZE rendered slides wait for the encoder at any time.
+PIPELINE_STREAMING = False
+STREAM_QUEUE_SIZE = 8
+
+# --- Render Cache Settings ---
+# Rendered slides are cached by text, font and style, and reused across runs.
+RENDER_CACHE_ENABLED = True
+RENDER_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "Audio2VideoMaker", "slides"
+)
+# Least recently used slides are evicted when the cache grows above this size.
+RENDER_CACHE_MAX_BYTES = 512 * 2**20  # 512 MiB
+
+# --- Config Cache Settings ---
+# Validated configuration files are cached by contents, so unchanged
+# configurations skip YAML parsing and validation on the next run.
+CONFIG_CACHE_ENABLED = True
+CONFIG_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "Audio2VideoMaker", "configs"
+)
+# Least recently used entries are evicted when the cache grows above this size.
+CONFIG_CACHE_MAX_BYTES = 64 * 2**20  # 64 MiB
+
 # --- Video Settings ---
 # Frames per second for the generated video.
 VIDEO_FPS = 2
+
+# How slide texts reach the video: "burned" draws each slide into the video
+# frames, "subtitles" encodes a single background frame and adds the texts as
+# timed subtitles styled from the settings above (a styled ASS track in .mkv
+# files, see VIDEO_SUBTITLES_BURN_IN for other containers).
+VIDEO_TEXT_MODES = ("burned", "subtitles")
+VIDEO_TEXT_MODE = "burned"
+# In "subtitles" mode, containers that cannot carry an ASS track (e.g. .mp4)
+# get a plain mov_text track, without the font, color, alignment and padding
+# settings (a warning is logged); True burns the styled subtitles into the
+# frames by libass instead (larger files, but always visible and styled).
+VIDEO_SUBTITLES_BURN_IN = False
+
+# x264 preset used to encode the video (slower presets compress better).
+VIDEO_PRESET = "faster"
+
+# Encoder backend used to write the video.
+# "moviepy" renders every frame through Python, "ffmpeg" hands the slides
+# directly to ffmpeg as a concat list (much faster for long videos), and
+# "incremental" encodes each slide into a cached segment and only re-encodes
+# the slides that changed since the last run.
+VIDEO_ENCODERS = ("moviepy", "ffmpeg", "incremental")
+VIDEO_ENCODER = "moviepy"
+
+# Copy the input audio into the video without re-encoding when its codec can be
+# stored in an MP4 file; other codecs are re-encoded to AAC.
+AUDIO_PASSTHROUGH = False
+MP4_AUDIO_CODECS = ("aac", "mp3", "alac", "ac3", "eac3")
+
+# Decode each slide only while the moviepy encoder is on it, instead of decoding
+# all slides up front; memory use then stays flat whatever the number of slides.
+VIDEO_LAZY_CLIPS = True
+
+# Number of processes encoding the video in parallel, each encoding a chunk of
+# the timeline (1 encodes the whole timeline at once), and the number of threads
+# each process may use (None shares the CPU cores evenly between them).
+VIDEO_ENCODE_JOBS = 1
+VIDEO_ENCODE_THREADS = None
+
+# --- Segment Cache Settings ---
+# Per-slide video segments used by the "incremental" encoder.
+SEGMENT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "Audio2VideoMaker", "segments"
+)
+# Least recently used segments are evicted when the cache grows above this size.
+SEGMENT_CACHE_MAX_BYTES = 2 * 2**30  # 2 GiB
+
+# --- Preview Settings ---
+# The "preview" command renders a draft to check slide timing against the audio:
+# slides are rendered at this fraction of the image size, encoded with the
+# fastest preset and kept in their own folder and caches, apart from final renders.
+PREVIEW_SCALE = 0.5
+PREVIEW_VIDEO_PRESET = "ultrafast"
+PREVIEW_VIDEO_ENCODER = "ffmpeg"
+# Folder (next to the configuration file) for preview images and trimmed audio.
+PREVIEW_FOLDER = "preview"
+PREVIEW_RENDER_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "Audio2VideoMaker", "preview_slides"
+)
+PREVIEW_SEGMENT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "Audio2VideoMaker", "preview_segments"
+)
+
+# --- Startup Settings ---
+# Maximum time (in milliseconds) spent importing modules when starting in
+# "image" or "test" mode, checked by startup_check.py.
+STARTUP_IMPORT_BUDGET_MS = 400
+# Modules that must not be imported when starting in "image" or "test" mode.
+STARTUP_FORBIDDEN_MODULES = ("moviepy",)
+
+# --- Memory Check Settings ---
+# Number of slides of the synthetic job measured by memory_check.py.
+MEMORY_CHECK_SLIDES = 100
+# Per-stage memory budgets in MiB for that job: (peak, retained), measured as
+# resident memory (RSS) of the process, so Pillow's image buffers are included.
+# "retained" is the memory a stage leaves resident once its result is released.
+MEMORY_BUDGETS_MB = {
+    "validation": (4, 2),
+    "render": (16, 8),
+    "clips": (24, 8),  # decodes one slide at a time (about 2.1 MiB each)
+    "encode": (64, 8),
+}
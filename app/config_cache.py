@@ -0,0 +1,154 @@
+"""
+Cache for validated configuration files.
+
+Validated configurations are keyed by a hash of the configuration file
+contents, its location and the config.py settings that affect validation, and
+stored in marshal's compact binary format. Each entry records the size and
+modification time of the audio file it was validated against, so an entry is
+only reused while the audio file is unchanged. The cache is bounded in size
+and evicts the least recently used entries first.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+
+import config
+from utils import Status, prune_directory
+
+logger = logging.getLogger(__name__)
+
+# Bump when the validation code changes in a way that affects its output
+CONFIG_CACHE_VERSION = 2
+
+# config.py settings that affect how a configuration file is validated
+VALIDATION_SETTINGS = (
+    "VIDEO_ENCODER",
+    "VIDEO_ENCODERS",
+    "IMAGE_DEDUPLICATE",
+    "IMAGE_OUTPUT_FORMAT",
+)
+
+
+def get_config_key(config_path: str, content: bytes) -> str:
+    """
+    Computes the cache key of a configuration file.
+
+    Args:
+        config_path: The path to the configuration file
+            (relative paths in the file are resolved against its folder).
+        content: The contents of the configuration file.
+
+    Returns:
+        The hex digest identifying the validated configuration.
+    """
+    digest = hashlib.sha256(content)
+    digest.update(
+        json.dumps(
+            {
+                "version": CONFIG_CACHE_VERSION,
+                "path": os.path.abspath(config_path),
+                "settings": {
+                    name: getattr(config, name) for name in VALIDATION_SETTINGS
+                },
+            },
+            sort_keys=True,
+        ).encode("utf8")
+    )
+    return digest.hexdigest()
+
+
+def _get_entry_path(key: str) -> str:
+    """Returns the path of a cache entry."""
+    return os.path.join(config.CONFIG_CACHE_DIR, f"{key}.bin")
+
+
+def _get_audio_stat(audio_path: str) -> tuple[int, int] | None:
+    """Returns the modification time and size of the audio file, if it exists."""
+    try:
+        stat = os.stat(audio_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load(key: str) -> dict | None:
+    """
+    Loads a validated configuration from the cache.
+
+    Args:
+        key: The cache key of the configuration file.
+
+    Returns:
+        The validated state stored by `store`, or None if it is not cached
+        or its audio file changed since it was validated.
+    """
+    entry_path = _get_entry_path(key)
+    try:
+        with open(entry_path, "rb") as fp:
+            entry = marshal.load(fp)
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, TypeError):
+        logger.warning(f"{Status.WARNING} Ignoring corrupt config cache entry: {key}")
+        return None
+
+    audio_path, audio_stat = entry["audio"]
+    if _get_audio_stat(audio_path) != audio_stat:
+        return None
+
+    # Mark the entry as recently used
+    os.utime(entry_path)
+    return entry["state"]
+
+
+def store(key: str, state: dict, audio_path: str) -> None:
+    """
+    Stores a validated configuration in the cache.
+
+    Configurations holding values marshal cannot store (such as YAML
+    timestamps) are not cached.
+
+    Args:
+        key: The cache key of the configuration file.
+        state: The validated state (built-in types only).
+        audio_path: The audio file the configuration was validated against.
+    """
+    try:
+        payload = marshal.dumps(
+            {"audio": (audio_path, _get_audio_stat(audio_path)), "state": state}
+        )
+    except ValueError as err:
+        logger.debug(f"{Status.WARNING} Configuration not cached: {err}")
+        return
+
+    os.makedirs(config.CONFIG_CACHE_DIR, exist_ok=True)
+    entry_path = _get_entry_path(key)
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(payload)
+    os.replace(tmp_path, entry_path)
+
+
+def prune(max_bytes: int | None = None) -> tuple[int, int]:
+    """
+    Evicts the least recently used entries until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes: The maximum cache size in bytes.
+            Defaults to `CONFIG_CACHE_MAX_BYTES`; 0 empties the cache.
+
+    Returns:
+        A tuple of the number of removed entries and the remaining cache size.
+    """
+    if max_bytes is None:
+        max_bytes = config.CONFIG_CACHE_MAX_BYTES
+    removed, total_size = prune_directory(config.CONFIG_CACHE_DIR, max_bytes, ".bin")
+    if removed:
+        logger.info(
+            f"{Status.OK} Config cache: removed {removed} entries, "
+            f"{total_size / 2**20:.1f} MiB left in {config.CONFIG_CACHE_DIR}"
+        )
+    return removed, total_size
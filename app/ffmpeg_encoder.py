@@ -0,0 +1,677 @@
+"""
+Direct ffmpeg encoding backend.
+
+This module hands the slide timeline straight to ffmpeg using the concat
+demuxer, so still images are never pushed frame-by-frame through Python.
+The output layout (H.264/yuv420p video, AAC audio, MP4 container) matches
+the files written by the moviepy backend.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_probe
+import config
+import profiler
+import timeline as timeline_utils
+from utils import Status, get_file_digest, prune_directory
+
+logger = logging.getLogger(__name__)
+
+
+# Encoder backends that only run ffmpeg (see `encode_video`)
+FFMPEG_ENCODERS = ("ffmpeg", "incremental")
+
+
+class FFmpegError(Exception):
+    """Custom exception for failed ffmpeg invocations."""
+
+    pass
+
+
+def get_ffmpeg_binary() -> str:
+    """
+    Finds the ffmpeg executable, using the same lookup rules as moviepy.
+
+    Returns:
+        The path to the ffmpeg executable.
+    """
+    binary = os.getenv("FFMPEG_BINARY", "ffmpeg-imageio")
+    if binary == "ffmpeg-imageio":
+        import imageio_ffmpeg
+
+        binary = imageio_ffmpeg.get_ffmpeg_exe()
+    elif binary == "auto-detect":
+        binary = "ffmpeg"
+    return binary
+
+
+def run_ffmpeg(args: list[str]) -> None:
+    """
+    Runs ffmpeg with the given arguments.
+
+    Args:
+        args: The ffmpeg arguments (without the binary itself).
+
+    Raises:
+        FFmpegError: If ffmpeg exits with a non-zero status.
+    """
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    logger.debug(f"{Status.WIP} Running: {' '.join(cmd)}")
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise FFmpegError(
+            f"ffmpeg failed with exit code {result.returncode}:\n"
+            f"{result.stderr.decode(errors='replace')}"
+        )
+
+
+def _escape_concat_path(path: str) -> str:
+    """Escapes a file path for use in an ffmpeg concat list."""
+    return os.path.abspath(path).replace("'", "'\\''")
+
+
+def write_concat_list(timeline: list[tuple[str, float]], list_path: str) -> str:
+    """
+    Writes a concat demuxer list for the given slide timeline.
+
+    Args:
+        timeline: A list of (image path, duration) tuples.
+        list_path: The path to write the concat list to.
+
+    Returns:
+        The path to the concat list.
+
+    Raises:
+        FileNotFoundError: If an image file does not exist.
+    """
+    with open(list_path, "wt", encoding="utf8") as fp:
+        fp.write("ffconcat version 1.0\n")
+        for image_path, duration in timeline:
+            if not os.path.isfile(image_path):
+                raise FileNotFoundError(f"Image file not found: {image_path}")
+            fp.write(f"file '{_escape_concat_path(image_path)}'\n")
+            fp.write(f"duration {duration:.6f}\n")
+        # The concat demuxer ignores the duration of the last entry
+        # unless the file is listed once more.
+        fp.write(f"file '{_escape_concat_path(timeline[-1][0])}'\n")
+    return list_path
+
+
+def get_video_encoding_args(
+    preset: str | None = None, video_filter: str | None = None
+) -> list[str]:
+    """
+    Returns the ffmpeg video encoding arguments for still-image slides.
+
+    Args:
+        preset: The x264 preset to use. Defaults to `VIDEO_PRESET`.
+        video_filter: A filter chain to apply to the frames before the
+            frame rate is set, e.g. to burn in subtitles.
+
+    Returns:
+        A list of ffmpeg arguments.
+    """
+    preset = preset or config.VIDEO_PRESET
+    fps_filter = f"fps={config.VIDEO_FPS}"
+    return [
+        "-c:v",
+        "libx264",
+        "-preset",
+        preset,
+        "-tune",
+        "stillimage",
+        "-pix_fmt",
+        "yuv420p",
+        "-vf",
+        f"{video_filter},{fps_filter}" if video_filter else fps_filter,
+    ]
+
+
+def get_thread_args(threads: int | None = None) -> list[str]:
+    """
+    Returns the ffmpeg arguments limiting the number of encoder threads.
+
+    Args:
+        threads: The number of threads. Defaults to `VIDEO_ENCODE_THREADS`.
+
+    Returns:
+        A list of ffmpeg arguments (empty if ffmpeg may use all cores).
+    """
+    threads = threads or config.VIDEO_ENCODE_THREADS
+    return ["-threads", str(threads)] if threads else []
+
+
+def get_audio_encoding_args(
+    audio_path: str | None = None, passthrough: bool = False
+) -> list[str]:
+    """
+    Returns the ffmpeg audio encoding arguments.
+
+    With `passthrough`, the audio stream is copied as it is when its codec
+    can be stored in an MP4 file, and only re-encoded to AAC otherwise.
+
+    Args:
+        audio_path: The path to the input audio file (needed for passthrough).
+        passthrough: Whether to copy compatible audio streams without re-encoding.
+
+    Returns:
+        A list of ffmpeg arguments.
+    """
+    if passthrough and audio_path:
+        codec = audio_probe.probe_audio(audio_path)["codec"]
+        if codec in config.MP4_AUDIO_CODECS:
+            logger.info(f"{Status.OK} Audio: copying the {codec} stream as it is")
+            return ["-c:a", "copy"]
+        logger.info(
+            f"{Status.WIP} Audio: {codec} cannot be stored in MP4, re-encoding to AAC"
+        )
+    else:
+        logger.info(f"{Status.WIP} Audio: re-encoding to AAC")
+    return ["-c:a", "aac", "-ar", "44100", "-ac", "2"]
+
+
+def encode_slideshow(
+    timeline: list[tuple[str, float]],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    audio_passthrough: bool = False,
+) -> None:
+    """
+    Encodes a slide timeline and an audio file into a video with ffmpeg.
+
+    Args:
+        timeline: A list of (image path, duration) tuples.
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        duration: The total duration of the video (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+    """
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        list_path = write_concat_list(timeline, os.path.join(tmp_dir, "slides.txt"))
+        logger.info(f"{Status.WIP} Encoding {len(timeline)} slides with ffmpeg")
+        run_ffmpeg(
+            [
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_path,
+                "-i",
+                audio_path,
+                "-map",
+                "0:v:0",
+                "-map",
+                "1:a:0",
+                *get_video_encoding_args(),
+                *get_thread_args(),
+                *get_audio_encoding_args(audio_path, audio_passthrough),
+                "-t",
+                f"{duration:.3f}",
+                output_path,
+            ]
+        )
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
+
+
+def encode_renditions(
+    timelines: list[tuple[list[tuple[str, float]], str]],
+    audio_path: str,
+    duration: float,
+    audio_passthrough: bool = False,
+) -> None:
+    """
+    Encodes several renditions of a video in a single ffmpeg run.
+
+    The audio is read and decoded once and shared by all outputs.
+
+    Args:
+        timelines: A list of (slide timeline, output path) tuples, one per rendition.
+        audio_path: The path to the audio file.
+        duration: The total duration of the videos (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+    """
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        input_args = []
+        output_args = []
+        audio_args = get_audio_encoding_args(audio_path, audio_passthrough)
+        for index, (timeline, output_path) in enumerate(timelines):
+            list_path = write_concat_list(
+                timeline, os.path.join(tmp_dir, f"slides_{index}.txt")
+            )
+            input_args += ["-f", "concat", "-safe", "0", "-i", list_path]
+            output_args += [
+                "-map",
+                f"{index}:v:0",
+                "-map",
+                f"{len(timelines)}:a:0",
+                *get_video_encoding_args(),
+                *get_thread_args(),
+                *audio_args,
+                "-t",
+                f"{duration:.3f}",
+                output_path,
+            ]
+        logger.info(f"{Status.WIP} Encoding {len(timelines)} renditions with ffmpeg")
+        run_ffmpeg([*input_args, "-i", audio_path, *output_args])
+    for _, output_path in timelines:
+        logger.info(f"{Status.OK} Video file created at: {output_path}")
+
+
+def get_encode_threads(jobs: int) -> int:
+    """
+    Returns the number of threads each of `jobs` parallel encoders may use.
+
+    Args:
+        jobs: The number of encoders running at the same time.
+
+    Returns:
+        `VIDEO_ENCODE_THREADS`, or an even share of the CPU cores.
+    """
+    if config.VIDEO_ENCODE_THREADS:
+        return config.VIDEO_ENCODE_THREADS
+    return max(1, (os.cpu_count() or 1) // max(jobs, 1))
+
+
+def encode_chunk(
+    slides: list[tuple[str, int]], output_path: str, threads: int | None = None
+) -> str:
+    """
+    Encodes a chunk of the timeline into a video file (without audio).
+
+    Args:
+        slides: A list of (image path, frame count) tuples.
+        output_path: The path to save the chunk.
+        threads: The number of threads ffmpeg may use.
+
+    Returns:
+        The path to the chunk.
+    """
+    list_path = f"{output_path}.txt"
+    write_concat_list(
+        [(image, frames / config.VIDEO_FPS) for image, frames in slides], list_path
+    )
+    run_ffmpeg(
+        [
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_path,
+            *get_video_encoding_args(),
+            "-frames:v",
+            str(sum(frames for _, frames in slides)),
+            *get_thread_args(threads),
+            "-an",
+            output_path,
+        ]
+    )
+    return output_path
+
+
+def encode_chunks(
+    chunks: list[list[tuple[str, int]]], tmp_dir: str, jobs: int
+) -> list[str]:
+    """
+    Encodes timeline chunks in parallel ffmpeg processes.
+
+    Args:
+        chunks: A list of chunks, each a list of (image path, frame count) tuples.
+        tmp_dir: The folder to write the chunks to.
+        jobs: The number of ffmpeg processes to run at the same time.
+
+    Returns:
+        The paths to the encoded chunks, in timeline order.
+    """
+    threads = get_encode_threads(jobs)
+    logger.info(
+        f"{Status.WIP} Encoding {len(chunks)} chunks in parallel with ffmpeg "
+        f"({threads} threads each)"
+    )
+    chunk_paths = [
+        os.path.join(tmp_dir, f"chunk_{i:04d}.mp4") for i in range(len(chunks))
+    ]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(
+            executor.map(encode_chunk, chunks, chunk_paths, [threads] * len(chunks))
+        )
+
+
+def _get_segment_key(image_path: str, frame_count: int) -> str:
+    """Computes the cache key of a slide segment."""
+    payload = json.dumps(
+        {
+            "image": get_file_digest(image_path),
+            "frames": frame_count,
+            "fps": config.VIDEO_FPS,
+            "args": get_video_encoding_args(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+
+def encode_segment(
+    image_path: str, frame_count: int, output_path: str, threads: int | None = None
+) -> None:
+    """
+    Encodes a single slide into a standalone video segment (without audio).
+
+    Args:
+        image_path: The path to the slide image.
+        frame_count: The number of frames of the segment.
+        output_path: The path to save the segment.
+        threads: The number of threads ffmpeg may use.
+    """
+    if not os.path.isfile(image_path):
+        raise FileNotFoundError(f"Image file not found: {image_path}")
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.mp4"
+    run_ffmpeg(
+        [
+            "-loop",
+            "1",
+            "-framerate",
+            str(config.VIDEO_FPS),
+            "-i",
+            image_path,
+            "-frames:v",
+            str(frame_count),
+            *get_video_encoding_args(),
+            *get_thread_args(threads),
+            "-an",
+            tmp_path,
+        ]
+    )
+    os.replace(tmp_path, output_path)
+
+
+def get_cached_segments(timeline: list[tuple[str, float]], jobs: int = 1) -> list[str]:
+    """
+    Returns the encoded segment of every slide, encoding only missing segments.
+
+    Segments are cached by image contents and frame count,
+    so unchanged slides are never encoded again.
+
+    Args:
+        timeline: A list of (image path, duration) tuples.
+        jobs: The number of segments to encode at the same time.
+
+    Returns:
+        The paths to the segments, in timeline order.
+    """
+    os.makedirs(config.SEGMENT_CACHE_DIR, exist_ok=True)
+    frame_counts = timeline_utils.get_frame_counts(timeline, config.VIDEO_FPS)
+
+    segment_paths = []
+    missing_segments: dict[str, tuple[str, int]] = {}
+    for (image_path, _), frame_count in zip(timeline, frame_counts):
+        if frame_count <= 0:
+            # Shown by the next slide, see `get_frame_counts`
+            continue
+        if not os.path.isfile(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        key = _get_segment_key(image_path, frame_count)
+        segment_path = os.path.join(config.SEGMENT_CACHE_DIR, f"{key}.mp4")
+        if os.path.isfile(segment_path):
+            # Mark the segment as recently used
+            os.utime(segment_path)
+        else:
+            missing_segments[segment_path] = (image_path, frame_count)
+        segment_paths.append(segment_path)
+
+    logger.info(
+        f"{Status.WIP} Segments: encoding {len(missing_segments)}, "
+        f"reusing {len(segment_paths) - len(missing_segments)} from cache"
+    )
+    threads = get_encode_threads(jobs) if jobs > 1 else None
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [
+            executor.submit(encode_segment, image_path, frames, segment_path, threads)
+            for segment_path, (image_path, frames) in missing_segments.items()
+        ]
+        for future in futures:
+            future.result()  # Raises the error of a failed segment, if any
+    return segment_paths
+
+
+def concat_segments(
+    segment_paths: list[str],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    audio_passthrough: bool = False,
+) -> None:
+    """
+    Joins encoded segments without re-encoding and muxes in the audio.
+
+    Args:
+        segment_paths: The paths to the video segments, in order.
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        duration: The total duration of the video (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+    """
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        list_path = os.path.join(tmp_dir, "segments.txt")
+        with open(list_path, "wt", encoding="utf8") as fp:
+            fp.write("ffconcat version 1.0\n")
+            for segment_path in segment_paths:
+                fp.write(f"file '{_escape_concat_path(segment_path)}'\n")
+        with profiler.span("video.mux", segments=len(segment_paths)):
+            run_ffmpeg(
+                [
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    list_path,
+                    "-i",
+                    audio_path,
+                    "-map",
+                    "0:v:0",
+                    "-map",
+                    "1:a:0",
+                    "-c:v",
+                    "copy",
+                    *get_audio_encoding_args(audio_path, audio_passthrough),
+                    "-t",
+                    f"{duration:.3f}",
+                    output_path,
+                ]
+            )
+
+
+def encode_incremental(
+    timeline: list[tuple[str, float]],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    audio_passthrough: bool = False,
+    jobs: int = 1,
+) -> None:
+    """
+    Encodes a slide timeline from cached per-slide segments.
+
+    Only slides whose image or frame count changed are encoded; the video is
+    then assembled by stream-copy concatenation and muxed with the audio.
+
+    Args:
+        timeline: A list of (image path, duration) tuples.
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        duration: The total duration of the video (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+        jobs: The number of segments to encode at the same time.
+    """
+    segment_paths = get_cached_segments(timeline, jobs)
+    logger.info(f"{Status.WIP} Joining {len(segment_paths)} segments")
+    concat_segments(segment_paths, audio_path, output_path, duration, audio_passthrough)
+    prune_segment_cache()
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
+
+
+def encode_slideshow_in_chunks(
+    slides: list[tuple[str, float]],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    audio_passthrough: bool,
+    jobs: int,
+) -> None:
+    """
+    Encodes a slide timeline in parallel ffmpeg processes, one chunk of slides
+    each, then joins the chunks without re-encoding and muxes the audio in once.
+
+    Args:
+        slides: A list of (image path, duration) tuples.
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        duration: The total duration of the video (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+        jobs: The number of chunks to encode at the same time.
+    """
+    frame_counts = timeline_utils.get_frame_counts(slides, config.VIDEO_FPS)
+    chunks = timeline_utils.split_timeline(slides, frame_counts, jobs)
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        chunk_paths = encode_chunks(chunks, tmp_dir, jobs)
+        logger.info(f"{Status.WIP} Joining {len(chunk_paths)} chunks")
+        concat_segments(
+            chunk_paths, audio_path, output_path, duration, audio_passthrough
+        )
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
+
+
+def encode_video(
+    images: list[str],
+    durations: list[float],
+    audio_path: str,
+    output_path: str,
+    encoder: str = "ffmpeg",
+    audio_passthrough: bool | None = None,
+    encode_jobs: int | None = None,
+) -> None:
+    """
+    Encodes slide images and audio into a video with an ffmpeg-only encoder
+    backend, without loading moviepy.
+
+    Args:
+        images: A list of image paths.
+        durations: A list of durations for each image (in seconds).
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        encoder: The encoder backend to use (one of `FFMPEG_ENCODERS`).
+        audio_passthrough: Whether to copy the audio stream without re-encoding
+            when its codec fits in MP4. Defaults to `AUDIO_PASSTHROUGH`.
+        encode_jobs: The number of processes to encode with, each encoding a
+            chunk of the timeline. Defaults to `VIDEO_ENCODE_JOBS`.
+
+    Raises:
+        ValueError: If the encoder backend is not an ffmpeg-only backend.
+    """
+    if encoder not in FFMPEG_ENCODERS:
+        raise ValueError(
+            f"Unsupported encoder '{encoder}', expected one of {FFMPEG_ENCODERS}"
+        )
+    if audio_passthrough is None:
+        audio_passthrough = config.AUDIO_PASSTHROUGH
+    encode_jobs = encode_jobs or config.VIDEO_ENCODE_JOBS
+
+    # Read the duration from the audio headers, without opening a decoder
+    duration_limit = audio_probe.get_audio_duration(audio_path)
+    slides = timeline_utils.build_timeline(images, durations, duration_limit)
+    with profiler.span("video.encode", encoder=encoder, jobs=encode_jobs):
+        if encoder == "incremental":
+            encode_incremental(
+                slides,
+                audio_path=audio_path,
+                output_path=output_path,
+                duration=duration_limit,
+                audio_passthrough=audio_passthrough,
+                jobs=encode_jobs,
+            )
+        elif encode_jobs > 1:
+            encode_slideshow_in_chunks(
+                slides,
+                audio_path=audio_path,
+                output_path=output_path,
+                duration=duration_limit,
+                audio_passthrough=audio_passthrough,
+                jobs=encode_jobs,
+            )
+        else:
+            encode_slideshow(
+                slides,
+                audio_path=audio_path,
+                output_path=output_path,
+                duration=duration_limit,
+                audio_passthrough=audio_passthrough,
+            )
+
+
+def mux_audio(
+    video_path: str,
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    audio_passthrough: bool = False,
+) -> None:
+    """
+    Muxes an audio file into a video file, without re-encoding the video.
+
+    Args:
+        video_path: The path to the video file (its audio is ignored).
+        audio_path: The path to the audio file.
+        output_path: The path to save the muxed video.
+        duration: The total duration of the video (in seconds).
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+    """
+    with profiler.span("video.mux"):
+        run_ffmpeg(
+            [
+                "-i",
+                video_path,
+                "-i",
+                audio_path,
+                "-map",
+                "0:v:0",
+                "-map",
+                "1:a:0",
+                "-c:v",
+                "copy",
+                *get_audio_encoding_args(audio_path, audio_passthrough),
+                "-t",
+                f"{duration:.3f}",
+                output_path,
+            ]
+        )
+
+
+def prune_segment_cache(max_bytes: int | None = None) -> tuple[int, int]:
+    """
+    Evicts the least recently used segments until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes: The maximum cache size in bytes.
+            Defaults to `SEGMENT_CACHE_MAX_BYTES`; 0 empties the cache.
+
+    Returns:
+        A tuple of the number of removed segments and the remaining cache size.
+    """
+    if max_bytes is None:
+        max_bytes = config.SEGMENT_CACHE_MAX_BYTES
+    removed, total_size = prune_directory(config.SEGMENT_CACHE_DIR, max_bytes, ".mp4")
+    if removed:
+        logger.info(
+            f"{Status.OK} Segment cache: removed {removed} segments, "
+            f"{total_size / 2**20:.1f} MiB left in {config.SEGMENT_CACHE_DIR}"
+        )
+    return removed, total_size
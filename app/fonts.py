@@ -0,0 +1,152 @@
+"""
+Process-wide font registry.
+
+This module loads each font face once per process, and memoizes text
+bounding boxes and glyph advances, so repeated slides and lines (e.g. lyric
+choruses) do not reparse font files or remeasure the same text.
+"""
+
+import functools
+import logging
+import os
+
+from PIL import ImageFont
+
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of (font, text) bounding boxes kept in memory
+TEXT_BBOX_CACHE_SIZE = 8192
+
+
+def resolve_font_path(font_path: str, variant: str | None = None) -> str:
+    """
+    Resolves the file of a font variant next to the given font file.
+
+    For example, the "Bold" variant of "Tinos/Tinos-Regular.ttf"
+    is "Tinos/Tinos-Bold.ttf".
+
+    Args:
+        font_path: The path to the font file.
+        variant: The font variant (e.g. "Bold", "Italic"), or None.
+
+    Returns:
+        The path to the variant's font file, or the given font path
+        if there is no such variant.
+    """
+    if not variant:
+        return font_path
+    folder, filename = os.path.split(font_path)
+    family, ext = os.path.splitext(filename)
+    family = family.rsplit("-", 1)[0]
+    variant_path = os.path.join(folder, f"{family}-{variant}{ext}")
+    if os.path.isfile(variant_path):
+        return variant_path
+    logger.warning(
+        f"{Status.WARNING} Font variant '{variant}' not found at {variant_path}. "
+        f"Using {font_path}."
+    )
+    return font_path
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(
+    font_path: str, size: int, variant: str | None = None
+) -> ImageFont.FreeTypeFont:
+    """
+    Loads a font face, or falls back to the default font.
+
+    Fonts are cached by (path, size, variant), so each face is only
+    loaded once per process.
+
+    Args:
+        font_path: The path to the font file.
+        size: The font size.
+        variant: The font variant (e.g. "Bold", "Italic"), or None.
+
+    Returns:
+        An ImageFont object.
+    """
+    font_path = resolve_font_path(font_path, variant)
+    if os.path.isfile(font_path):
+        logger.debug(f"{Status.OK} Loading font from: {font_path}")
+        return ImageFont.truetype(font_path, size=size)
+    logger.warning(
+        f"{Status.WARNING} Font not found at {font_path}. Using default font."
+    )
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=TEXT_BBOX_CACHE_SIZE)
+def get_text_bbox(
+    font: ImageFont.FreeTypeFont, text: str
+) -> tuple[float, float, float, float]:
+    """
+    Returns the (memoized) bounding box of a text rendered with a font.
+
+    Args:
+        font: The font used for rendering the text.
+        text: The text to measure.
+
+    Returns:
+        A tuple of (left, top, right, bottom).
+    """
+    return font.getbbox(text)
+
+
+class GlyphAdvances(dict):
+    """
+    Table of the horizontal advance (in pixels) of each character of a font,
+    filled in as new characters are looked up.
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont) -> None:
+        super().__init__()
+        self.font = font
+
+    def __missing__(self, char: str) -> float:
+        advance = self[char] = self.font.getlength(char)
+        return advance
+
+
+@functools.lru_cache(maxsize=None)
+def get_glyph_advances(font: ImageFont.FreeTypeFont) -> GlyphAdvances:
+    """
+    Returns the glyph advance table of a font (one table per font).
+
+    Args:
+        font: The font to measure with.
+
+    Returns:
+        A dictionary of character advances in pixels.
+    """
+    return GlyphAdvances(font)
+
+
+def get_cache_stats() -> dict[str, int]:
+    """
+    Returns the counters of the font, text bounding box and glyph advance caches.
+
+    Returns:
+        A dictionary of cache counters.
+    """
+    font_info = load_font.cache_info()
+    bbox_info = get_text_bbox.cache_info()
+    return {
+        "font_hits": font_info.hits,
+        "font_misses": font_info.misses,
+        "bbox_hits": bbox_info.hits,
+        "bbox_misses": bbox_info.misses,
+        "bbox_size": bbox_info.currsize,
+        "glyph_tables": get_glyph_advances.cache_info().currsize,
+    }
+
+
+def clear_cache() -> None:
+    """
+    Clears the font, text bounding box and glyph advance caches.
+    """
+    load_font.cache_clear()
+    get_text_bbox.cache_clear()
+    get_glyph_advances.cache_clear()
@@ -0,0 +1,154 @@
+"""
+Shared-memory frame buffers.
+
+This module hands rendered frames from render worker processes to the
+parent process (the streaming encoder, or the in-memory pipeline) without
+pickling them: the parent process owns a small pool of reusable
+shared-memory buffers, each holding one RGB frame. A worker copies the pixels
+of its slide into the buffer it was given (no pickling or pipe), and the
+parent reads the buffer as a numpy view (the streaming encoder writes it to
+ffmpeg as is, the in-memory pipeline copies it out), then releases it for
+the next slide.
+"""
+
+import logging
+import math
+import queue
+import threading
+from multiprocessing import shared_memory, util
+from typing import TYPE_CHECKING
+
+from PIL import Image
+
+from utils import Status
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Buffers attached by this (worker) process, by name
+_attached_buffers: dict[str, shared_memory.SharedMemory] = {}
+
+
+class FramePool:
+    """
+    A pool of reusable shared-memory buffers, each holding one RGB frame.
+
+    Buffers are identified by their slot number: `acquire` hands out a free
+    slot, and `release` returns it to the pool once its frame was consumed.
+    """
+
+    def __init__(self, size: int, dimension: tuple[int, int]) -> None:
+        """
+        Initializes the FramePool.
+
+        Args:
+            size: The number of buffers.
+            dimension: The (width, height) of the frames.
+        """
+        width, height = dimension
+        self.size = size
+        self.shape = (height, width, 3)
+        self.frame_size = math.prod(self.shape)
+        self._buffers = [
+            shared_memory.SharedMemory(create=True, size=self.frame_size)
+            for _ in range(size)
+        ]
+        self._free_slots: queue.Queue[int] = queue.Queue()
+        for slot in range(size):
+            self._free_slots.put(slot)
+        logger.debug(
+            f"{Status.OK} Frame pool: {size} buffers of {self.frame_size} bytes"
+        )
+
+    def get_name(self, slot: int) -> str:
+        """Returns the shared-memory name of a buffer, to pass to a worker."""
+        return self._buffers[slot].name
+
+    def acquire(self, stop: threading.Event | None = None) -> int | None:
+        """
+        Takes a free buffer from the pool, waiting until one is released.
+
+        Args:
+            stop: Stops waiting when set.
+
+        Returns:
+            The slot of the buffer, or None if `stop` was set first.
+        """
+        while stop is None or not stop.is_set():
+            try:
+                return self._free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def release(self, slot: int) -> None:
+        """Returns a buffer to the pool."""
+        self._free_slots.put(slot)
+
+    def view(self, slot: int) -> "np.ndarray":
+        """
+        Returns a buffer as a numpy array (height x width x 3), without copying.
+
+        The view is only valid until the buffer is released.
+        """
+        import numpy as np
+
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self._buffers[slot].buf)
+
+    def close(self) -> None:
+        """Frees the buffers; views of them must not be used afterwards."""
+        for buffer in self._buffers:
+            buffer.unlink()
+            try:
+                buffer.close()
+            except BufferError:
+                # A view is still referenced; the memory is freed with it
+                logger.debug(f"{Status.WARNING} Frame buffer {buffer.name} in use")
+        self._buffers = []
+
+    def __enter__(self) -> "FramePool":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.close()
+        return False
+
+
+def _close_attached_buffers() -> None:
+    """Detaches the buffers attached by this (worker) process."""
+    for buffer in _attached_buffers.values():
+        buffer.close()
+    _attached_buffers.clear()
+
+
+def write_frame(name: str, img: Image.Image) -> None:
+    """
+    Copies an RGB image into a shared-memory buffer from a worker process.
+
+    Buffers are attached once per process and kept attached for reuse,
+    until the process exits.
+
+    Args:
+        name: The shared-memory name of the buffer (see `FramePool.get_name`).
+        img: The image to copy; its size must match the pool's frames.
+
+    Raises:
+        ValueError: If the image does not fit the buffer.
+    """
+    buffer = _attached_buffers.get(name)
+    if buffer is None:
+        if not _attached_buffers:
+            # Pool workers exit without running atexit handlers, but with finalizers
+            util.Finalize(None, _close_attached_buffers, exitpriority=10)
+        buffer = _attached_buffers[name] = shared_memory.SharedMemory(name=name)
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    data = img.tobytes()
+    if len(data) > buffer.size:
+        raise ValueError(
+            f"Frame of {len(data)} bytes does not fit in a {buffer.size} bytes buffer"
+        )
+    buffer.buf[: len(data)] = data
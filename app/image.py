@@ -5,35 +5,48 @@ This module provides functions to generate images with text,
 handle font loading, and manage text layout within image boundaries.
 """
 
+import functools
 import logging
-import os
-import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
 
 from PIL import Image, ImageDraw, ImageFont
 
 import config
-import text_manager
-from utils import Status
+import fonts
+import frame_pool
+import layout
+import profiler
+import render_cache
+from utils import Status, apply_config_settings, get_config_settings
+
+if TYPE_CHECKING:
+    # numpy is only needed by the in-memory pipeline, see `render_multiple_text_images`
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Font loaded once per render worker process (see `_init_render_worker`)
+_worker_font: ImageFont.FreeTypeFont | None = None
+
+
+class ImageGenerationError(Exception):
+    """Custom exception for slides that failed to render."""
+
+    pass
+
 
 def get_font() -> ImageFont.FreeTypeFont:
     """
-    Loads the specified font or falls back to a default font.
+    Loads the configured font or falls back to a default font.
+
+    The font is loaded once per process and cached afterwards.
 
     Returns:
         An ImageFont object.
     """
-    if os.path.isfile(config.FONT_PATH):
-        logger.debug(f"{Status.OK} Loading font from: {config.FONT_PATH}")
-        font = ImageFont.truetype(config.FONT_PATH, size=config.FONT_SIZE)
-    else:
-        logger.warning(
-            f"{Status.WARNING} Font not found at {config.FONT_PATH}. Using default font."
-        )
-        font = ImageFont.load_default()
-    return font
+    return fonts.load_font(config.FONT_PATH, config.FONT_SIZE, config.FONT_VARIANT)
 
 
 def get_text_box_dimensions(font: ImageFont.FreeTypeFont, text: str) -> tuple[int, int]:
@@ -47,7 +60,7 @@ def get_text_box_dimensions(font: ImageFont.FreeTypeFont, text: str) -> tuple[in
     Returns:
         A tuple containing the width and height of the text box.
     """
-    left, top, right, bottom = font.getbbox(text)
+    left, top, right, bottom = fonts.get_text_bbox(font, text)
     width = int(right - left)
     height = int(bottom - top)
     logger.debug(
@@ -56,82 +69,273 @@ def get_text_box_dimensions(font: ImageFont.FreeTypeFont, text: str) -> tuple[in
     return width, height
 
 
-def is_text_within_image_bounds(font: ImageFont.FreeTypeFont, text: str) -> bool:
+@functools.lru_cache(maxsize=8)
+def _get_gradient_palette(
+    background_color: tuple[int, int, int], text_color: tuple[int, int, int]
+) -> list[int]:
+    """Returns the 256 blends from the background color (0) to the text color (255)."""
+    palette = []
+    for index in range(256):
+        palette.extend(
+            round(background + (text - background) * index / 255)
+            for background, text in zip(background_color, text_color)
+        )
+    return palette
+
+
+def get_gradient_palette() -> list[int]:
+    """
+    Returns the palette of a slide: the background color, the text color and
+    the anti-aliased blends between them, as drawn by Pillow.
+
+    Returns:
+        A flat list of 256 RGB entries, index 0 being the background color
+        and index 255 the text color.
     """
-    Checks if the text fits within the image boundaries.
+    return _get_gradient_palette(
+        tuple(config.IMAGE_BACKGROUND_COLOR), tuple(config.IMAGE_TEXT_COLOR)
+    )
+
+
+def to_palette_image(img: Image.Image) -> Image.Image:
+    """
+    Converts an RGB slide to a palette image with the gradient palette.
+
+    Each pixel's blend between the background and text colors is read from
+    the color channel in which they differ most.
 
     Args:
-        font: The font used for rendering the text.
-        text: The text to check.
+        img: The RGB slide.
 
     Returns:
-        True if the text fits within the image, False otherwise.
+        The palette ("P" mode) image.
     """
-    x_padding = config.IMAGE_PADDING_X
-    y_padding = config.IMAGE_PADDING_Y
+    background, text = config.IMAGE_BACKGROUND_COLOR, config.IMAGE_TEXT_COLOR
+    channel = max(range(3), key=lambda band: abs(text[band] - background[band]))
+    low, high = background[channel], text[channel]
+    if high == low:  # Text drawn in the background color
+        lut = [0] * 256
+    else:
+        lut = [
+            min(max(round((value - low) * 255 / (high - low)), 0), 255)
+            for value in range(256)
+        ]
+    img = img.getchannel(channel).point(lut).convert("P")
+    img.putpalette(get_gradient_palette())
+    return img
 
-    width, height = get_text_box_dimensions(font, text)
-    if width + x_padding * 2 > config.IMAGE_DIMENSION[0]:
-        logger.warning(
-            f"{Status.WARNING} Text '{text[:20]}...' exceeds image width limit."
-        )
-        return False
-    if height + y_padding * 2 > config.IMAGE_DIMENSION[1]:
-        logger.warning(
-            f"{Status.WARNING} Text '{text[:20]}...' exceeds image height limit."
+
+def save_slide(img: Image.Image, output_path: str) -> None:
+    """
+    Saves a slide in the `IMAGE_OUTPUT_FORMAT` format.
+
+    RGB slides are converted to the gradient palette for "png-palette".
+
+    Args:
+        img: The slide.
+        output_path: The path to save the slide to.
+
+    Raises:
+        ValueError: If `IMAGE_OUTPUT_FORMAT` is not supported.
+    """
+    output_format = config.IMAGE_OUTPUT_FORMAT
+    if output_format == "bmp":
+        img.save(output_path, format="BMP")
+        return
+    if output_format == "png-palette" and img.mode != "P":
+        img = to_palette_image(img)
+    elif output_format not in config.IMAGE_OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unsupported image output format '{output_format}', "
+            f"expected one of {config.IMAGE_OUTPUT_FORMATS}"
         )
-        return False
-    return True
+    img.save(output_path, format="PNG", compress_level=config.IMAGE_PNG_COMPRESS_LEVEL)
+
+
+def render_text_image(
+    text_input: str, font: ImageFont.FreeTypeFont | None = None, palette: bool = False
+) -> Image.Image:
+    """
+    Renders an image with the given text in memory.
+
+    Args:
+        text_input: The text to render on the image.
+        font: The font to render with. Loaded with `get_font()` if not given.
+        palette: Whether to render a palette ("P" mode) image with the gradient
+            palette (see `get_gradient_palette`) instead of an RGB image. The
+            text is then drawn on a single 8-bit channel.
+
+    Returns:
+        The rendered image.
+    """
+    font = font or get_font()
+    with profiler.span("image.layout"):
+        # Measures, positions and validates all lines in one pass
+        text_layout = layout.layout_text(text_input, font)
+
+    with profiler.span("image.draw"):
+        if palette:
+            # Draws the text coverage, which indexes the gradient palette
+            img = Image.new(mode="L", size=config.IMAGE_DIMENSION, color=0)
+            text_color = 255
+        else:
+            img = Image.new(
+                mode="RGB",
+                size=config.IMAGE_DIMENSION,
+                color=config.IMAGE_BACKGROUND_COLOR,
+            )
+            text_color = config.IMAGE_TEXT_COLOR
+        draw = ImageDraw.Draw(img)
+        for position, line in zip(text_layout.positions, text_layout.lines):
+            draw.text(xy=position, text=line, font=font, fill=text_color)
+        if palette:
+            img = img.convert("P")
+            img.putpalette(get_gradient_palette())
+
+    logger.debug(f" - Image text: {text_input[:50]}...")
+    return img
 
 
-def generate_text_image(text_input: str, output_path: str) -> str:
+def generate_text_image(
+    text_input: str,
+    output_path: str,
+    font: ImageFont.FreeTypeFont | None = None,
+) -> str:
     """
     Generates an image with the given text.
 
     Args:
         text_input: The text to render on the image.
         output_path: The path to save the generated image.
+        font: The font to render with. Loaded with `get_font()` if not given.
 
     Returns:
         The path to the generated image.
     """
-    text_input = text_input.rstrip()  # Remove trailing spaces/line breaks
-    txt_mgr = text_manager.TextManager()
-    txt_mgr.set_text(text_input)  # Validate text using TextManager
-    text_input = txt_mgr.rearrange_text()  # Rearrange text to be at possible center
-    time.sleep(0.2)  # Small delay to allow for text validation
-
-    font = get_font()
-    img = Image.new(
-        mode="RGB", size=config.IMAGE_DIMENSION, color=config.IMAGE_BACKGROUND_COLOR
+    img = render_text_image(
+        text_input, font=font, palette=config.IMAGE_OUTPUT_FORMAT == "png-palette"
     )
-    draw = ImageDraw.Draw(img)
-
-    y_pos = config.IMAGE_PADDING_Y
-    for line in text_input.splitlines():
-        # Remove only trailing spaces/line breaks
-        line = line.rstrip()
-        # Check if the line fits within the image
-        if not is_text_within_image_bounds(font, line):
-            logger.warning(
-                f"{Status.WARNING} Line '{line[:20]}...' may not fit perfectly in the image."
-            )
-        draw.text(
-            xy=(config.IMAGE_PADDING_X, y_pos),
-            text=line,
-            font=font,
-            fill=config.IMAGE_TEXT_COLOR,
-        )
-        y_pos += config.IMAGE_PADDING_ROW
-
-    img.save(output_path)
+    with profiler.span("image.save"):
+        save_slide(img, output_path)
     logger.debug(f"{Status.OK} Image generated at: {output_path}")
-    logger.debug(f" - Image text: {text_input[:50]}...")
     return output_path
 
 
+def _init_render_worker(settings: dict) -> None:
+    """
+    Initializes a render worker process with the parent's config and font.
+
+    Args:
+        settings: The config settings of the parent process.
+    """
+    global _worker_font
+    apply_config_settings(settings)
+    _worker_font = get_font()
+
+
+def render_slide(
+    text_input: str,
+    output_path: str,
+    font: ImageFont.FreeTypeFont | None = None,
+    use_cache: bool = True,
+) -> bool:
+    """
+    Renders a slide, reusing a previously rendered image when possible.
+
+    Args:
+        text_input: The text to render on the image.
+        output_path: The path to save the generated image.
+        font: The font to render with. Loaded with `get_font()` if not given.
+        use_cache: Whether to look up and store the slide in the render cache.
+
+    Returns:
+        True if the slide was reused from the render cache, False if it was rendered.
+    """
+    if not use_cache:
+        generate_text_image(text_input, output_path, font=font)
+        return False
+
+    key = render_cache.get_render_key(text_input)
+    if render_cache.restore(key, output_path):
+        logger.debug(f"{Status.OK} Image reused from render cache: {output_path}")
+        return True
+    generate_text_image(text_input, output_path, font=font)
+    render_cache.store(key, output_path)
+    return False
+
+
+def _render_worker_task(
+    index: int, text_input: str, output_path: str, use_cache: bool
+) -> tuple[int, str, bool, str | None]:
+    """
+    Renders a single slide in a worker process.
+
+    Args:
+        index: The index of the slide.
+        text_input: The text to render on the image.
+        output_path: The path to save the generated image.
+        use_cache: Whether to use the render cache.
+
+    Returns:
+        A tuple of the slide index, the output path, whether the slide was
+        reused from the render cache and an error message (or None if the
+        slide was rendered successfully).
+    """
+    try:
+        reused = render_slide(text_input, output_path, _worker_font, use_cache)
+    except Exception as err:
+        return index, output_path, False, f"{type(err).__name__}: {err}"
+    return index, output_path, reused, None
+
+
+def _report_slide(image_path: str, reused: bool) -> None:
+    """Prints the status of a single slide."""
+    if reused:
+        print(f"{Status.OK} Reused Image: {image_path}")
+    else:
+        print(f"{Status.OK} Generated Image: {image_path}")
+
+
+def _group_slides(
+    text_inputs: list[str], output_paths: list[str | None]
+) -> tuple[list[int], list[int]]:
+    """
+    Groups the slides that show the same image, so each image is rendered once.
+
+    Slides with the same output path show the same image (see
+    `IMAGE_DEDUPLICATE` in the configuration validation); slides without an
+    output path are grouped by render key when `IMAGE_DEDUPLICATE` is set.
+
+    Args:
+        text_inputs: A list of text strings.
+        output_paths: The output path of each slide, or None.
+
+    Returns:
+        A tuple of the index of the first slide of each group,
+        and the group of each slide.
+    """
+    groups: dict[tuple[str, str | int], int] = {}
+    first_indices: list[int] = []
+    slide_groups: list[int] = []
+    for index, (text, path) in enumerate(zip(text_inputs, output_paths)):
+        if path:
+            key = ("path", path)
+        elif config.IMAGE_DEDUPLICATE:
+            key = ("render", render_cache.get_render_key(text))
+        else:
+            key = ("index", index)
+        if key not in groups:
+            groups[key] = len(first_indices)
+            first_indices.append(index)
+        slide_groups.append(groups[key])
+    return first_indices, slide_groups
+
+
 def generate_multiple_text_images(
-    text_inputs: list[str], output_paths: list[str]
+    text_inputs: list[str],
+    output_paths: list[str],
+    workers: int | None = None,
+    use_cache: bool | None = None,
 ) -> None:
     """
     Generates multiple text images.
@@ -139,10 +343,201 @@ def generate_multiple_text_images(
     Args:
         text_inputs: A list of text strings.
         output_paths: A list of output paths for the images.
+        workers: The number of worker processes to render with. Defaults to
+            `IMAGE_RENDER_WORKERS`; slides are rendered in the current process if 1.
+        use_cache: Whether to reuse unchanged slides from the render cache.
+            Defaults to `RENDER_CACHE_ENABLED`.
+
+    Raises:
+        ImageGenerationError: If any slide failed to render in a worker.
     """
-    for text, out_path in zip(text_inputs, output_paths):
-        image_path = generate_text_image(text, out_path)
-        print(f"{Status.OK} Generated Image: {image_path}")
+    workers = workers or config.IMAGE_RENDER_WORKERS
+    if use_cache is None:
+        use_cache = config.RENDER_CACHE_ENABLED
+
+    # Slides sharing an image file are rendered once
+    first_indices, _ = _group_slides(text_inputs, output_paths)
+    if len(first_indices) < len(text_inputs):
+        logger.info(
+            f"{Status.OK} Rendering {len(first_indices)} unique images "
+            f"for {len(text_inputs)} slides"
+        )
+        text_inputs = [text_inputs[index] for index in first_indices]
+        output_paths = [output_paths[index] for index in first_indices]
+
+    reused_count = 0
+    if workers <= 1:
+        font = get_font()
+        for text, out_path in zip(text_inputs, output_paths):
+            reused = render_slide(text, out_path, font=font, use_cache=use_cache)
+            reused_count += reused
+            _report_slide(out_path, reused)
+        logger.debug(f"Font cache stats: {fonts.get_cache_stats()}")
+    else:
+        logger.info(
+            f"{Status.WIP} Rendering {len(text_inputs)} images with {workers} workers"
+        )
+        failures: list[str] = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_render_worker,
+            initargs=(get_config_settings(),),
+        ) as executor:
+            results = executor.map(
+                _render_worker_task,
+                range(len(text_inputs)),
+                text_inputs,
+                output_paths,
+                [use_cache] * len(text_inputs),
+            )
+            # Results are yielded in slide order, whatever order workers finish in
+            for index, image_path, reused, error in results:
+                if error:
+                    logger.error(
+                        f"{Status.NOT_OK} Image {index + 1} ({image_path}) failed: {error}"
+                    )
+                    failures.append(f"{index + 1}: {image_path}")
+                else:
+                    reused_count += reused
+                    _report_slide(image_path, reused)
+
+        if failures:
+            raise ImageGenerationError(
+                f"{len(failures)} of {len(text_inputs)} images failed to render: "
+                + ", ".join(failures)
+            )
+
+    if use_cache:
+        logger.info(
+            f"{Status.OK} Render cache: {reused_count} of {len(text_inputs)} images reused"
+        )
+        render_cache.prune()
+
+
+def _render_shared_frame_worker_task(
+    index: int, text_input: str, output_paths: list[str], buffer_name: str
+) -> tuple[int, str | None]:
+    """
+    Renders a single slide into a shared-memory frame buffer in a worker process.
+
+    Args:
+        index: The index of the slide.
+        text_input: The text to render on the image.
+        output_paths: The paths to also save the image to.
+        buffer_name: The shared-memory name of the frame buffer
+            (see `frame_pool.FramePool`).
+
+    Returns:
+        A tuple of the slide index and an error message
+        (or None if the slide was rendered successfully).
+    """
+    try:
+        img = render_text_image(text_input, font=_worker_font)
+        for output_path in output_paths:
+            save_slide(img, output_path)
+        frame_pool.write_frame(buffer_name, img)
+    except Exception as err:
+        return index, f"{type(err).__name__}: {err}"
+    return index, None
+
+
+def render_multiple_text_images(
+    text_inputs: list[str],
+    output_paths: list[str] | None = None,
+    workers: int | None = None,
+) -> list["np.ndarray"]:
+    """
+    Renders multiple text images in memory, for use by the video stage.
+
+    Slides showing the same image are rendered once and share the same array.
+
+    Args:
+        text_inputs: A list of text strings.
+        output_paths: Optional output paths to also save the images to.
+        workers: The number of worker processes to render with. Defaults to
+            `IMAGE_RENDER_WORKERS`; slides are rendered in the current process if 1.
+
+    Returns:
+        A list of RGB arrays (height x width x 3), one per text.
+
+    Raises:
+        ImageGenerationError: If any slide failed to render in a worker.
+    """
+    import numpy as np
+
+    workers = workers or config.IMAGE_RENDER_WORKERS
+    paths = output_paths or [None] * len(text_inputs)
+    first_indices, slide_groups = _group_slides(text_inputs, paths)
+    unique_texts = [text_inputs[index] for index in first_indices]
+    unique_paths = [paths[index] for index in first_indices]
+
+    if workers <= 1:
+        font = get_font()
+        unique_frames = []
+        for text, out_path in zip(unique_texts, unique_paths):
+            img = render_text_image(text, font=font)
+            if out_path:
+                with profiler.span("image.save"):
+                    save_slide(img, out_path)
+            unique_frames.append(np.asarray(img))
+    else:
+        logger.info(
+            f"{Status.WIP} Rendering {len(unique_texts)} images in memory with {workers} workers"
+        )
+        unique_frames = [None] * len(unique_texts)
+        failures: list[str] = []
+        # Frames come back through reusable shared-memory buffers instead of
+        # being pickled. The video stage needs every frame at once, so each is
+        # copied out and its buffer released for the next slide, which bounds
+        # shared memory to two frames per worker
+        with frame_pool.FramePool(
+            workers * 2, config.IMAGE_DIMENSION
+        ) as pool, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_render_worker,
+            initargs=(get_config_settings(),),
+        ) as executor:
+            pending: deque = deque()
+
+            def collect_frame() -> None:
+                """Copies the oldest submitted frame out of its buffer."""
+                position, future, slot = pending.popleft()
+                index, error = future.result()
+                if error:
+                    logger.error(f"{Status.NOT_OK} Image {index + 1} failed: {error}")
+                    failures.append(str(index + 1))
+                else:
+                    unique_frames[position] = pool.view(slot).copy()
+                pool.release(slot)
+
+            for position, (index, text, out_path) in enumerate(
+                zip(first_indices, unique_texts, unique_paths)
+            ):
+                if len(pending) == pool.size:
+                    collect_frame()
+                slot = pool.acquire()
+                future = executor.submit(
+                    _render_shared_frame_worker_task,
+                    index,
+                    text,
+                    [out_path] if out_path else [],
+                    pool.get_name(slot),
+                )
+                pending.append((position, future, slot))
+            while pending:
+                collect_frame()
+
+        if failures:
+            raise ImageGenerationError(
+                f"{len(failures)} of {len(text_inputs)} images failed to render: "
+                + ", ".join(failures)
+            )
+
+    logger.info(
+        f"{Status.OK} Rendered {len(unique_frames)} images in memory "
+        f"for {len(text_inputs)} slides"
+    )
+    return [unique_frames[group] for group in slide_groups]
 
 
 def create_test_image() -> None:
@@ -0,0 +1,181 @@
+"""
+Pixel-based text layout.
+
+This module lays out the text of a slide in pixels: all lines are measured in
+one pass with the font's glyph advance table, lines that are too wide are
+optionally wrapped, and each line is positioned (left-aligned or centered by
+its real width) while lines that do not fit in the image are reported.
+"""
+
+import logging
+
+from PIL import ImageFont
+
+import config
+import fonts
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+
+class TextLayout:
+    """
+    The lines of a slide and where to draw them.
+    """
+
+    def __init__(
+        self,
+        lines: list[str],
+        positions: list[tuple[int, int]],
+        widths: list[float],
+        overflows: list[str],
+    ) -> None:
+        """
+        Initializes the TextLayout.
+
+        Args:
+            lines: The lines to draw.
+            positions: The (x, y) position of each line.
+            widths: The width of each line in pixels.
+            overflows: Descriptions of the lines that do not fit in the image.
+        """
+        self.lines = lines
+        self.positions = positions
+        self.widths = widths
+        self.overflows = overflows
+
+    @property
+    def fits(self) -> bool:
+        """Whether all lines fit in the image."""
+        return not self.overflows
+
+
+def measure_lines(font: ImageFont.FreeTypeFont, lines: list[str]) -> list[float]:
+    """
+    Measures the width of many lines in one pass.
+
+    Widths are summed from the font's cached glyph advance table; with the
+    Raqm layout engine (which applies kerning and shaping) each line is
+    measured by the font instead.
+
+    Args:
+        font: The font used for rendering the text.
+        lines: The lines to measure.
+
+    Returns:
+        The width of each line in pixels.
+    """
+    if getattr(font, "layout_engine", None) == ImageFont.Layout.RAQM:
+        return [font.getlength(line) for line in lines]
+    advances = fonts.get_glyph_advances(font)
+    return [sum(map(advances.__getitem__, line)) for line in lines]
+
+
+def wrap_line(font: ImageFont.FreeTypeFont, line: str, max_width: float) -> list[str]:
+    """
+    Wraps a line at spaces so each piece fits in `max_width` pixels.
+
+    Words wider than a whole line are broken between characters.
+    The indentation of the line is kept on its first piece.
+
+    Args:
+        font: The font used for rendering the text.
+        line: The line to wrap.
+        max_width: The maximum width of a line in pixels.
+
+    Returns:
+        The wrapped pieces of the line.
+    """
+    indent = line[: len(line) - len(line.lstrip(" "))]
+    words = line.lstrip(" ").split(" ")
+    indent_width, space_width, *word_widths = measure_lines(font, [indent, " ", *words])
+
+    pieces = []
+    current, current_width = indent, indent_width
+    for word, word_width in zip(words, word_widths):
+        if current.strip():
+            if current_width + space_width + word_width <= max_width:
+                current += " " + word
+                current_width += space_width + word_width
+                continue
+            pieces.append(current)
+            current, current_width = "", 0.0
+
+        if current_width + word_width <= max_width:
+            current += word
+            current_width += word_width
+            continue
+        for char, char_width in zip(word, measure_lines(font, list(word))):
+            if current.strip() and current_width + char_width > max_width:
+                pieces.append(current)
+                current, current_width = "", 0.0
+            current += char
+            current_width += char_width
+    pieces.append(current)
+    return pieces
+
+
+def layout_text(text: str, font: ImageFont.FreeTypeFont) -> TextLayout:
+    """
+    Lays out the text of a slide, centered vertically in the image.
+
+    Lines are left-aligned at `IMAGE_PADDING_X` or centered by their width
+    (`IMAGE_TEXT_ALIGN`), and wrapped when `IMAGE_TEXT_WRAP` is enabled.
+    Lines that do not fit in the image are logged as warnings.
+
+    Args:
+        text: The slide text.
+        font: The font used for rendering the text.
+
+    Returns:
+        The layout of the slide.
+
+    Raises:
+        ValueError: If `IMAGE_TEXT_ALIGN` is not supported.
+    """
+    if config.IMAGE_TEXT_ALIGN not in config.IMAGE_TEXT_ALIGNMENTS:
+        raise ValueError(
+            f"Unsupported text alignment '{config.IMAGE_TEXT_ALIGN}', "
+            f"expected one of {config.IMAGE_TEXT_ALIGNMENTS}"
+        )
+    centered = config.IMAGE_TEXT_ALIGN == "center"
+    image_width, image_height = config.IMAGE_DIMENSION
+    padding_x, padding_y = config.IMAGE_PADDING_X, config.IMAGE_PADDING_Y
+    row_height = config.IMAGE_PADDING_ROW
+    max_width = image_width - padding_x * 2
+
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    if centered:
+        lines = [line.strip() for line in lines]
+    widths = measure_lines(font, lines)
+
+    if config.IMAGE_TEXT_WRAP and any(width > max_width for width in widths):
+        wrapped_lines, wrapped_widths = [], []
+        for line, width in zip(lines, widths):
+            pieces = [line] if width <= max_width else wrap_line(font, line, max_width)
+            wrapped_lines.extend(pieces)
+            wrapped_widths.extend(
+                [width] if len(pieces) == 1 else measure_lines(font, pieces)
+            )
+        lines, widths = wrapped_lines, wrapped_widths
+
+    # Center the block of lines vertically, but not above the top padding
+    top = max(padding_y, (image_height - len(lines) * row_height) // 2)
+    positions = []
+    overflows = []
+    for index, (line, width) in enumerate(zip(lines, widths)):
+        x = padding_x + int(max(max_width - width, 0) / 2) if centered else padding_x
+        positions.append((x, top + index * row_height))
+        if width > max_width:
+            overflows.append(
+                f"Line {index + 1} is {width - max_width:.0f} px too wide: '{line[:20]}...'"
+            )
+    if padding_y * 2 + len(lines) * row_height > image_height:
+        max_lines = (image_height - padding_y * 2) // row_height
+        overflows.append(
+            f"{len(lines)} lines do not fit in the image height (max {max_lines} lines)"
+        )
+
+    for overflow in overflows:
+        logger.warning(f"{Status.WARNING} {overflow}")
+    return TextLayout(lines, positions, widths, overflows)
@@ -8,9 +8,18 @@ based on a provided configuration file.
 import logging
 import sys
 
+import config as settings
+import config_cache
 import validation
 import image
-import video
+import ffmpeg_encoder
+import preview
+import profiler
+import render_cache
+import renditions
+import stream_encoder
+import timed_text
+from utils import Status, apply_config_settings
 
 # --- Configuration ---
 DEBUG_FLAG = False  # Set to True for detailed debug logs
@@ -27,6 +36,15 @@ def main(
     config: validation.GetConfig,
     generate_image: bool = True,
     generate_video: bool = False,
+    encoder: str | None = None,
+    workers: int | None = None,
+    use_cache: bool | None = None,
+    in_memory: bool | None = None,
+    save_images: bool = False,
+    audio_passthrough: bool | None = None,
+    encode_jobs: int | None = None,
+    streaming: bool | None = None,
+    text_mode: str | None = None,
 ) -> None:
     """
     Main function to generate images and/or video based on the configuration.
@@ -35,78 +53,349 @@ def main(
         config: The configuration object containing settings and data.
         generate_image: Whether to generate images.
         generate_video: Whether to generate a video.
+        encoder: The video encoder backend ("moviepy", "ffmpeg" or "incremental").
+            Defaults to the 'encoder' set in the configuration file.
+        workers: The number of worker processes used to render images.
+            Defaults to `IMAGE_RENDER_WORKERS` in config.py.
+        use_cache: Whether to reuse unchanged images from the render cache.
+            Defaults to `RENDER_CACHE_ENABLED` in config.py.
+        in_memory: Whether to pass rendered images to the video stage in memory
+            when generating both images and video. Defaults to
+            `PIPELINE_IN_MEMORY` in config.py.
+        save_images: Whether to also save the images to disk in in-memory mode.
+        audio_passthrough: Whether to copy the audio without re-encoding when its
+            codec fits in MP4. Defaults to `AUDIO_PASSTHROUGH` in config.py.
+        encode_jobs: The number of processes encoding chunks of the video in
+            parallel. Defaults to `VIDEO_ENCODE_JOBS` in config.py.
+        streaming: Whether to stream each rendered image to ffmpeg while later
+            images are still being rendered, when generating both images and
+            video. Defaults to `PIPELINE_STREAMING` in config.py.
+        text_mode: "burned" to draw the texts into the video frames, or
+            "subtitles" to carry them as a subtitle track over a single
+            background frame. Defaults to `VIDEO_TEXT_MODE` in config.py.
+
+    Raises:
+        ValueError: If the text mode is not supported.
     """
     logger.debug("Starting AudioVideoMaker process...")
     config_data = config
+    encoder = encoder or config_data.video_encoder
+    if in_memory is None:
+        in_memory = settings.PIPELINE_IN_MEMORY
+    if streaming is None:
+        streaming = settings.PIPELINE_STREAMING
+    text_mode = text_mode or settings.VIDEO_TEXT_MODE
+    if text_mode not in settings.VIDEO_TEXT_MODES:
+        raise ValueError(
+            f"Unsupported text mode '{text_mode}', "
+            f"expected one of {settings.VIDEO_TEXT_MODES}"
+        )
+    # Slide texts carried as subtitles are not drawn into the video frames
+    timed_text_video = generate_video and text_mode == "subtitles"
+    if timed_text_video:
+        generate_video = False
+        if generate_image:
+            logger.warning(
+                f"{Status.WARNING} Slide images are not used in 'subtitles' text "
+                "mode, skipping them."
+            )
+            generate_image = False
+
+    if config_data.renditions and not timed_text_video:
+        # Every rendition is encoded by a single ffmpeg run
+        logger.debug("Generating renditions...")
+        renditions.generate_renditions(
+            config_data,
+            generate_image=generate_image,
+            generate_video=generate_video,
+            workers=workers,
+            use_cache=use_cache,
+            audio_passthrough=audio_passthrough,
+        )
+        logger.debug("AudioVideoMaker process finished.")
+        return
+
+    if streaming and generate_image and generate_video:
+        logger.debug("Generating images and video in a stream...")
+        with profiler.span("video.generate", encoder="streaming"):
+            stream_encoder.encode_streaming(
+                text_inputs=config_data.txt_image_text,
+                durations=config_data.txt_image_durations,
+                audio_path=config_data.audio_file_path,
+                output_path=config_data.video_file_path,
+                output_paths=config_data.txt_image_names if save_images else None,
+                audio_passthrough=audio_passthrough,
+                workers=workers,
+            )
+        logger.debug("AudioVideoMaker process finished.")
+        return
+
+    # Images can only be handed over in memory to the moviepy encoder, in a
+    # single process: chunk processes read the images from disk
+    if in_memory and generate_image and generate_video:
+        if (encode_jobs or settings.VIDEO_ENCODE_JOBS) > 1:
+            logger.warning(
+                f"{Status.WARNING} Chunks encoded in parallel read images from disk, "
+                "saving images instead of handing them over in memory."
+            )
+        elif encoder == "moviepy":
+            # Imported here as moviepy is slow to import
+            import video
+
+            logger.debug("Generating images and video in memory...")
+            with profiler.span("image.generate", in_memory=True):
+                frames = image.render_multiple_text_images(
+                    text_inputs=config_data.txt_image_text,
+                    output_paths=config_data.txt_image_names if save_images else None,
+                    workers=workers,
+                )
+            with profiler.span("video.generate", encoder=encoder):
+                video.generate_video_with_audio(
+                    images=frames,
+                    durations=config_data.txt_image_durations,
+                    output_path=config_data.video_file_path,
+                    audio_path=config_data.audio_file_path,
+                    encoder=encoder,
+                    audio_passthrough=audio_passthrough,
+                    encode_jobs=encode_jobs,
+                )
+            logger.debug("AudioVideoMaker process finished.")
+            return
+        else:
+            logger.warning(
+                f"{Status.WARNING} The '{encoder}' encoder reads images from disk, "
+                "saving images instead of handing them over in memory."
+            )
 
     # Generate images
     if generate_image:
         logger.debug("Generating images...")
-        image.generate_multiple_text_images(
-            text_inputs=config_data.txt_image_text,
-            output_paths=config_data.txt_image_names,
-        )
+        with profiler.span("image.generate", slides=len(config_data.txt_image_text)):
+            image.generate_multiple_text_images(
+                text_inputs=config_data.txt_image_text,
+                output_paths=config_data.txt_image_names,
+                workers=workers,
+                use_cache=use_cache,
+            )
         logger.debug("Image generation completed.")
 
     # Generate video
     if generate_video:
         logger.debug("Generating video...")
-        video.generate_video_with_audio(
-            images=config_data.txt_image_names,
-            durations=config_data.txt_image_durations,
-            output_path=config_data.video_file_path,
-            audio_path=config_data.audio_file_path,
-        )
+        with profiler.span("video.generate", encoder=encoder):
+            if encoder in ffmpeg_encoder.FFMPEG_ENCODERS:
+                ffmpeg_encoder.encode_video(
+                    images=config_data.txt_image_names,
+                    durations=config_data.txt_image_durations,
+                    output_path=config_data.video_file_path,
+                    audio_path=config_data.audio_file_path,
+                    encoder=encoder,
+                    audio_passthrough=audio_passthrough,
+                    encode_jobs=encode_jobs,
+                )
+            else:
+                # Imported here as moviepy is slow to import
+                import video
+
+                video.generate_video_with_audio(
+                    images=config_data.txt_image_names,
+                    durations=config_data.txt_image_durations,
+                    output_path=config_data.video_file_path,
+                    audio_path=config_data.audio_file_path,
+                    encoder=encoder,
+                    audio_passthrough=audio_passthrough,
+                    encode_jobs=encode_jobs,
+                )
+        logger.debug("Video generation completed.")
+
+    # Generate video with a subtitle track
+    if timed_text_video:
+        logger.debug("Generating video with a subtitle track...")
+        with profiler.span("video.generate", encoder="timed_text"):
+            timed_text.encode_timed_text(
+                text_inputs=config_data.txt_image_text,
+                durations=config_data.txt_image_durations,
+                audio_path=config_data.audio_file_path,
+                output_path=config_data.video_file_path,
+                audio_passthrough=audio_passthrough,
+            )
         logger.debug("Video generation completed.")
 
     logger.debug("AudioVideoMaker process finished.")
 
 
-def parse_command_line_arguments() -> tuple[str | None, bool, bool]:
+def parse_command_line_arguments() -> tuple[str | None, bool, bool, dict[str, str]]:
     """
     Parses command-line arguments to determine the configuration file and actions.
 
+    Options are given as `--name=value` (e.g. `--encoder=ffmpeg`, `--workers=8`)
+    or as `--name` flags (e.g. `--no-cache`, `--in-memory`, `--streaming`). `--profile[=path]`
+    records per-stage timings and writes them as a Chrome trace.
+
+    `--image-format=png-palette` (or `png`, `bmp`) sets the file format of the
+    images (see `IMAGE_OUTPUT_FORMAT` in config.py).
+
+    The `preview` command (or `--preview`) renders a low-resolution draft of the
+    video to `<name>_preview.mp4`, optionally limited with `--seconds=N` and/or
+    `--slides=FIRST-LAST`, at `--scale=F` of the image size.
+
+    The `prune-cache` command trims the render, segment and config caches to their
+    configured maximum size (or to `--max-bytes=N`) and exits.
+
     Returns:
         A tuple containing:
         - The configuration file path (or None if not found).
         - Whether to generate images.
         - Whether to generate a video.
+        - A dictionary of options.
     """
     config_path = None
     generate_image = False
     generate_video = False
+    options: dict[str, str] = {}
 
-    for arg in sys.argv:
-        if arg.endswith(".yaml"):
+    for arg in sys.argv[1:]:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name.replace("-", "_")] = value
+        elif arg.endswith(".yaml"):
             config_path = arg
         elif arg == "image":
             generate_image = True
         elif arg == "video":
             generate_video = True
+        elif arg == "preview":
+            options["preview"] = ""
         elif arg == "test":
             image.create_test_image()
             sys.exit()
 
-    return config_path, generate_image, generate_video
+    if "prune-cache" in sys.argv[1:]:
+        max_bytes = options.get("max_bytes")
+        max_bytes = int(max_bytes) if max_bytes else None
+        removed, size = render_cache.prune(max_bytes)
+        print(f"{Status.OK} Render cache pruned: {removed} removed, {size} bytes left")
+        removed, size = ffmpeg_encoder.prune_segment_cache(max_bytes)
+        print(f"{Status.OK} Segment cache pruned: {removed} removed, {size} bytes left")
+        removed, size = config_cache.prune(max_bytes)
+        print(f"{Status.OK} Config cache pruned: {removed} removed, {size} bytes left")
+        sys.exit()
+
+    if "preview" in options:
+        generate_image = generate_video = True
+
+    return config_path, generate_image, generate_video, options
+
+
+def get_count_option(options: dict[str, str], name: str) -> int | None:
+    """
+    Returns the value of a `--name=N` option as a positive number.
+
+    Args:
+        options: The options parsed from the command line.
+        name: The option name (with underscores).
+
+    Returns:
+        The number, or None if the option is not given.
+
+    Raises:
+        ValueError: If the value is not a positive number.
+    """
+    if name not in options:
+        return None
+    value = options[name]
+    if not value.isdigit() or int(value) < 1:
+        option = name.replace("_", "-")
+        raise ValueError(f"--{option} expects a positive number, e.g. --{option}=4")
+    return int(value)
+
+
+def get_switch_option(options: dict[str, str], name: str) -> bool | None:
+    """
+    Returns the value of a `--name[=true|false]` or `--no-name` option.
+
+    Args:
+        options: The options parsed from the command line.
+        name: The option name (with underscores).
+
+    Returns:
+        True or False, or None if the option is not given.
+
+    Raises:
+        ValueError: If the value is not a boolean.
+    """
+    if f"no_{name}" in options:
+        return False
+    if name not in options:
+        return None
+    value = options[name].lower()
+    if value in ("", "true", "yes", "on", "1"):
+        return True
+    if value in ("false", "no", "off", "0"):
+        return False
+    option = name.replace("_", "-")
+    raise ValueError(f"--{option} expects true or false, e.g. --{option}=false")
 
 
 if __name__ == "__main__":
     logger.debug("-" * 50)
-    config_path, generate_image, generate_video = parse_command_line_arguments()
+    config_path, generate_image, generate_video, options = (
+        parse_command_line_arguments()
+    )
 
     if not config_path:
         logger.error("Missing config .yaml input file!")
         sys.exit(1)
 
     logger.debug(f"Found provided input config file: {config_path}")
+    try:
+        workers = get_count_option(options, "workers")
+        audio_passthrough = get_switch_option(options, "audio_passthrough")
+    except ValueError as e:
+        logger.error(f"{Status.NOT_OK} {e}")
+        sys.exit(1)
+    if "profile" in options:
+        profiler.enable()
+    if "no_cache" in options:
+        settings.CONFIG_CACHE_ENABLED = False
 
     try:
+        if options.get("image_format"):
+            if options["image_format"] not in settings.IMAGE_OUTPUT_FORMATS:
+                raise ValueError(
+                    f"Unsupported image format '{options['image_format']}', "
+                    f"expected one of {settings.IMAGE_OUTPUT_FORMATS}"
+                )
+            settings.IMAGE_OUTPUT_FORMAT = options["image_format"]
+        if "preview" in options:
+            apply_config_settings(
+                preview.get_preview_settings(
+                    float(options["scale"]) if options.get("scale") else None
+                )
+            )
         config_info = validation.GetConfig(config_path)
+        if "preview" in options:
+            preview.prepare_preview(
+                config_info,
+                seconds=float(options["seconds"]) if options.get("seconds") else None,
+                slides=options.get("slides") or None,
+            )
         # config_info.show_config() # Uncomment to show the config info
         main(
             config=config_info,
             generate_image=generate_image,
             generate_video=generate_video,
+            encoder=options.get("encoder"),
+            workers=workers,
+            use_cache=False if "no_cache" in options else None,
+            in_memory=True if "in_memory" in options else None,
+            streaming=True if "streaming" in options else None,
+            text_mode=options.get("text_mode") or None,
+            save_images="save_images" in options,
+            audio_passthrough=audio_passthrough,
+            encode_jobs=(
+                int(options["encode_jobs"]) if "encode_jobs" in options else None
+            ),
         )
     except validation.ConfigValidationError as e:
         logger.error(f"Configuration error: {e}")
@@ -114,5 +403,8 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
         sys.exit(1)
+    finally:
+        if profiler.is_enabled():
+            profiler.write_report(options["profile"] or "profile_trace.json")
 
     logger.debug("-" * 50)
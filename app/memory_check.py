@@ -0,0 +1,228 @@
+"""
+Memory regression check.
+
+This module runs each stage of the pipeline on a synthetic job (see
+benchmark.py), records the process's peak resident memory (RSS) while it runs
+and the resident memory it leaves behind once its result is released, and
+fails when a stage exceeds its budget from `MEMORY_BUDGETS_MB` in config.py.
+The budgets are set for a job of `MEMORY_CHECK_SLIDES` slides at the
+configured resolution.
+
+Resident memory includes buffers allocated by C extensions, such as Pillow's
+images. Each stage except encoding (mostly native and ffmpeg memory) is then
+run again under tracemalloc to break down the Python heap; memory used by
+ffmpeg processes is not included. Measuring the peak needs Linux's
+/proc/self/clear_refs.
+
+Usage:
+    python memory_check.py [--slides=100] [--output=path]
+"""
+
+import gc
+import json
+import logging
+import sys
+import tempfile
+import tracemalloc
+
+import benchmark
+import config
+import image
+import timeline
+import validation
+from utils import (
+    Status,
+    get_peak_rss_mb,
+    get_rss_mb,
+    override_config_settings,
+    reset_peak_rss,
+)
+
+logger = logging.getLogger("AudioVideoMaker.memory_check")
+
+
+def _measure_heap(function) -> tuple[float, float]:
+    """Returns the Python heap peak and retained size of a stage in MiB."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = function()
+        _, peak_size = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        end_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak_size - start_size) / 2**20, (end_size - start_size) / 2**20
+
+
+def measure_stage(function, measure_heap: bool = True) -> dict[str, float | None]:
+    """
+    Measures the memory used by a pipeline stage.
+
+    The stage runs once for the resident memory of the process and, with
+    `measure_heap`, once more under tracemalloc for the Python heap, so
+    tracemalloc's own bookkeeping is not counted as resident memory.
+
+    Args:
+        function: The stage to run; its return value is released before
+            the retained memory is measured.
+        measure_heap: Whether to run the stage again to measure the Python heap.
+
+    Returns:
+        A dictionary with the "peak_mb" resident memory used while the stage
+        ran and the resident memory still used afterwards ("retained_mb"),
+        and the same for the Python heap ("heap_peak_mb", "heap_retained_mb",
+        None without `measure_heap`), in MiB.
+    """
+    gc.collect()
+    reset_peak_rss()
+    start_rss = get_rss_mb()
+    result = function()
+    peak_rss = get_peak_rss_mb()
+    del result
+    gc.collect()
+    end_rss = get_rss_mb()
+
+    measurement = {
+        "peak_mb": round(peak_rss - start_rss, 2),
+        "retained_mb": round(end_rss - start_rss, 2),
+        "heap_peak_mb": None,
+        "heap_retained_mb": None,
+    }
+    if measure_heap:
+        heap_peak, heap_retained = _measure_heap(function)
+        measurement["heap_peak_mb"] = round(heap_peak, 2)
+        measurement["heap_retained_mb"] = round(heap_retained, 2)
+    return measurement
+
+
+def run_memory_check(config_path: str) -> dict[str, dict[str, float | None]]:
+    """
+    Measures the memory of each pipeline stage for one job.
+
+    The config cache is disabled, so the "validation" stage measures parsing
+    and validating the configuration rather than a cache hit.
+
+    Args:
+        config_path: The path to the job's configuration file.
+
+    Returns:
+        The measurements of each stage (see `measure_stage`).
+    """
+    # Imported here as moviepy is slow to import
+    import video
+
+    with override_config_settings({"CONFIG_CACHE_ENABLED": False}):
+        config_info = validation.GetConfig(config_path)
+        # Load fonts and caches up front, so they are not counted as retained
+        image.render_text_image(config_info.txt_image_text[0])
+
+        measurements = {}
+        measurements["validation"] = measure_stage(
+            lambda: validation.GetConfig(config_path)
+        )
+        measurements["render"] = measure_stage(
+            lambda: image.generate_multiple_text_images(
+                config_info.txt_image_text,
+                config_info.txt_image_names,
+                workers=1,
+                use_cache=False,
+            )
+        )
+
+        def build_clips():
+            images = config_info.txt_image_names
+            durations = config_info.txt_image_durations
+            if not config.VIDEO_LAZY_CLIPS:
+                return video.get_multiple_image_clips(
+                    images, durations, config_info.audio_duration
+                )
+            clip = video.LazySlideClip(
+                timeline.build_timeline(images, durations, config_info.audio_duration)
+            )
+            # Decode every slide, as the encoder does
+            for start_time in clip.start_times:
+                clip.get_frame(start_time)
+            return clip
+
+        measurements["clips"] = measure_stage(build_clips)
+        # Encoding memory is mostly native (ffmpeg, numpy), and a second full
+        # encode would double the run time, so its Python heap is not measured
+        measurements["encode"] = measure_stage(
+            lambda: video.generate_video_with_audio(
+                images=config_info.txt_image_names,
+                durations=config_info.txt_image_durations,
+                audio_path=config_info.audio_file_path,
+                output_path=config_info.video_file_path,
+                encoder="moviepy",
+            ),
+            measure_heap=False,
+        )
+    return measurements
+
+
+def _format_heap_mb(value: float | None, width: int) -> str:
+    """Formats a Python heap measurement, or "-" if it was not measured."""
+    return f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+
+
+def check_budgets(measurements: dict[str, dict[str, float | None]]) -> bool:
+    """
+    Compares the measurements against `MEMORY_BUDGETS_MB` and prints them.
+
+    Args:
+        measurements: The measurements returned by `run_memory_check`.
+
+    Returns:
+        True if every stage is within its budget.
+    """
+    passed = True
+    print(
+        f"{'stage':<12} {'peak (MiB)':>11} {'budget':>8} {'retained':>9} {'budget':>8} "
+        f"{'heap peak':>10} {'heap retained':>14}"
+    )
+    for stage, measurement in measurements.items():
+        peak_budget, retained_budget = config.MEMORY_BUDGETS_MB[stage]
+        over_budget = (
+            measurement["peak_mb"] > peak_budget
+            or measurement["retained_mb"] > retained_budget
+        )
+        passed = passed and not over_budget
+        print(
+            f"{stage:<12} {measurement['peak_mb']:>11.2f} {peak_budget:>8} "
+            f"{measurement['retained_mb']:>9.2f} {retained_budget:>8} "
+            f"{_format_heap_mb(measurement['heap_peak_mb'], 10)} "
+            f"{_format_heap_mb(measurement['heap_retained_mb'], 14)}"
+            f"{'  over budget!' if over_budget else ''}"
+        )
+    return passed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(logging.INFO)
+    options = dict(
+        arg[2:].partition("=")[::2] for arg in sys.argv[1:] if arg.startswith("--")
+    )
+    slides = int(options.get("slides") or config.MEMORY_CHECK_SLIDES)
+    if not reset_peak_rss():
+        logger.error(f"{Status.NOT_OK} Peak memory cannot be measured on this system")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="a2v_memory_") as folder:
+        logger.info(f"{Status.WIP} Measuring memory on a {slides} slides job...")
+        results = run_memory_check(benchmark.generate_config(folder, slides))
+
+    if options.get("output"):
+        with open(options["output"], "wt", encoding="utf8") as fp:
+            json.dump({"slides": slides, "stages": results}, fp, indent=2)
+
+    passed = check_budgets(results)
+    if passed:
+        logger.info(f"{Status.OK} All stages within their memory budgets")
+    else:
+        logger.error(f"{Status.NOT_OK} Memory budget exceeded")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,196 @@
+"""
+Low-resolution preview renders.
+
+A preview renders the slides at a fraction of the image size
+(`PREVIEW_SCALE`) and encodes them with the fastest x264 preset, optionally
+limited to a range of slides and/or to the first seconds of that range, so
+slide timing can be checked against the audio in a few seconds.
+
+Preview images, trimmed audio and render caches are kept apart from final
+renders, and the preview video is written next to the final video as
+`<name>_preview.mp4`.
+"""
+
+import logging
+import os
+
+import audio_probe
+import config
+import ffmpeg_encoder
+import validation
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+
+def _scale_even(size: int, scale: float) -> int:
+    """Scales an image size, rounded to an even number as x264 requires."""
+    return max(2, round(size * scale / 2) * 2)
+
+
+def get_preview_settings(scale: float | None = None) -> dict:
+    """
+    Returns the config.py settings of a preview render.
+
+    Args:
+        scale: The fraction of the image size to render at.
+            Defaults to `PREVIEW_SCALE`.
+
+    Returns:
+        A dictionary of setting names and values (see `apply_config_settings`).
+
+    Raises:
+        ValueError: If the scale is not between 0 and 1.
+    """
+    scale = scale or config.PREVIEW_SCALE
+    if not 0 < scale <= 1:
+        raise ValueError(f"Preview scale must be between 0 and 1, got {scale}")
+
+    width, height = config.IMAGE_DIMENSION
+    return {
+        "IMAGE_DIMENSION": (_scale_even(width, scale), _scale_even(height, scale)),
+        "FONT_SIZE": max(1, round(config.FONT_SIZE * scale)),
+        "IMAGE_PADDING_X": round(config.IMAGE_PADDING_X * scale),
+        "IMAGE_PADDING_Y": round(config.IMAGE_PADDING_Y * scale),
+        "IMAGE_PADDING_ROW": max(1, round(config.IMAGE_PADDING_ROW * scale)),
+        "VIDEO_PRESET": config.PREVIEW_VIDEO_PRESET,
+        "RENDER_CACHE_DIR": config.PREVIEW_RENDER_CACHE_DIR,
+        "SEGMENT_CACHE_DIR": config.PREVIEW_SEGMENT_CACHE_DIR,
+    }
+
+
+def parse_slide_range(value: str, slide_count: int) -> tuple[int, int]:
+    """
+    Parses a 1-based slide range such as "3-5", "3-" or "4".
+
+    Args:
+        value: The slide range.
+        slide_count: The number of slides in the configuration.
+
+    Returns:
+        The 0-based indices of the first and last slide (inclusive).
+
+    Raises:
+        ValueError: If the range is malformed or outside the slides.
+    """
+    first, separator, last = value.partition("-")
+    try:
+        first_index = int(first) - 1
+        last_index = int(last) - 1 if last else slide_count - 1
+    except ValueError:
+        raise ValueError(f"Invalid slide range '{value}', expected e.g. '3-5'")
+    if not separator:
+        last_index = first_index
+    if not 0 <= first_index <= last_index < slide_count:
+        raise ValueError(
+            f"Slide range '{value}' is outside the {slide_count} slides of the configuration"
+        )
+    return first_index, last_index
+
+
+def trim_audio(
+    audio_path: str, output_path: str, start: float, duration: float
+) -> None:
+    """
+    Cuts a part of the audio into a WAV file.
+
+    Args:
+        audio_path: The path to the audio file.
+        output_path: The path to save the audio part.
+        start: The start of the part in seconds.
+        duration: The duration of the part in seconds.
+    """
+    ffmpeg_encoder.run_ffmpeg(
+        [
+            "-ss",
+            f"{start:.3f}",
+            "-t",
+            f"{duration:.3f}",
+            "-i",
+            audio_path,
+            "-vn",
+            output_path,
+        ]
+    )
+
+
+def prepare_preview(
+    config_info: validation.GetConfig,
+    seconds: float | None = None,
+    slides: str | None = None,
+) -> None:
+    """
+    Points a validated configuration to the preview outputs, keeping only the
+    requested part of the timeline.
+
+    Args:
+        config_info: The validated configuration (updated in place).
+        seconds: Only preview this many seconds (from the first previewed slide).
+        slides: Only preview this 1-based slide range (e.g. "3-5").
+
+    Raises:
+        ValueError: If the slide range or the number of seconds is invalid.
+    """
+    durations = config_info.image_durations
+    audio_duration = config_info.audio_duration
+    first_index, last_index = (
+        parse_slide_range(slides, len(durations)) if slides else (0, len(durations) - 1)
+    )
+
+    start = sum(durations[:first_index])
+    end = (
+        audio_duration
+        if last_index == len(durations) - 1
+        else start + sum(durations[first_index : last_index + 1])
+    )
+    if seconds is not None:
+        if seconds <= 0:
+            raise ValueError(f"Preview seconds must be positive, got {seconds}")
+        end = min(end, start + seconds)
+    end = min(end, audio_duration)
+    if end <= start:
+        raise ValueError(
+            f"Slide {first_index + 1} starts after the end of the audio "
+            f"({audio_duration:.2f} secs)"
+        )
+
+    # Keep the slides shown between start and end
+    slide_start = start
+    kept = []
+    for index in range(first_index, last_index + 1):
+        if slide_start >= end:
+            break
+        kept.append(index)
+        slide_start += durations[index]
+
+    preview_folder = os.path.join(config_info.folder_path, config.PREVIEW_FOLDER)
+    os.makedirs(preview_folder, exist_ok=True)
+    image_names = []
+    for index in kept:
+        relative_path = os.path.relpath(
+            config_info.image_names[index], config_info.folder_path
+        )
+        image_path = os.path.join(preview_folder, relative_path)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        image_names.append(image_path)
+
+    config_info.image_texts = [config_info.image_texts[index] for index in kept]
+    config_info.image_durations = [durations[index] for index in kept]
+    config_info.image_names = image_names
+    video_stem, video_ext = os.path.splitext(config_info.video_file_path)
+    config_info.video_file_path = f"{video_stem}_preview{video_ext}"
+    config_info.video_encoder = config.PREVIEW_VIDEO_ENCODER
+    # A preview is a single low-resolution video
+    config_info.renditions = []
+
+    if start > 0 or end < audio_duration:
+        audio_path = os.path.join(preview_folder, "preview_audio.wav")
+        trim_audio(config_info.audio_file_path, audio_path, start, end - start)
+        config_info.audio_file_path = audio_path
+        config_info.audio_duration = audio_probe.get_audio_duration(audio_path)
+
+    logger.info(
+        f"{Status.OK} Preview: slides {kept[0] + 1}-{kept[-1] + 1} "
+        f"({start:.2f}-{end:.2f} secs) at {config.IMAGE_DIMENSION[0]}x"
+        f"{config.IMAGE_DIMENSION[1]}"
+    )
@@ -0,0 +1,272 @@
+"""
+Lightweight stage instrumentation.
+
+This module records spans (named, timed sections of the pipeline) with their
+wall time, CPU time and peak resident memory, and writes them as a Chrome trace
+(viewable in chrome://tracing or https://ui.perfetto.dev) with a summary
+table. Profiling is off by default; `span()` then returns a shared no-op
+object, so instrumented code pays next to nothing.
+
+Spans are recorded in the current process only; slides rendered by worker
+processes show up as the enclosing stage's span. The peak resident memory of
+a span is measured with Linux's /proc/self/clear_refs; elsewhere it is only
+sampled when the span starts and ends.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from utils import Status, get_peak_rss_mb, get_rss_mb, reset_peak_rss
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_events: list[dict] = []
+_start_time = 0.0
+# Whether the peak resident memory can be reset (see `enable`)
+_can_reset_peak_rss = False
+# Spans that are running, in any thread
+_open_spans: list["_Span"] = []
+_open_spans_lock = threading.Lock()
+
+
+def _update_peak_rss() -> float:
+    """
+    Folds the peak resident memory since the last reset into the running
+    spans, then resets it, so each span gets the peak of its own duration.
+
+    Returns:
+        The current resident memory in MiB.
+    """
+    if not _can_reset_peak_rss:
+        rss = get_rss_mb()
+        for open_span in _open_spans:
+            open_span.peak_rss_mb = max(open_span.peak_rss_mb, rss)
+        return rss
+
+    peak_rss = get_peak_rss_mb()
+    for open_span in _open_spans:
+        open_span.peak_rss_mb = max(open_span.peak_rss_mb, peak_rss)
+    reset_peak_rss()
+    return get_peak_rss_mb()
+
+
+def _get_children_cpu_time() -> float:
+    """Returns the CPU time of finished child processes (e.g. ffmpeg) in seconds."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class _Span:
+    """
+    A timed section of the pipeline, recorded when it exits.
+    """
+
+    __slots__ = (
+        "name",
+        "args",
+        "wall_start",
+        "cpu_start",
+        "children_cpu_start",
+        "peak_rss_mb",
+    )
+
+    def __init__(self, name: str, args: dict) -> None:
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.children_cpu_start = _get_children_cpu_time()
+        with _open_spans_lock:
+            self.peak_rss_mb = _update_peak_rss()
+            _open_spans.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        wall_end = time.perf_counter()
+        with _open_spans_lock:
+            _update_peak_rss()
+            _open_spans.remove(self)
+        _events.append(
+            {
+                "name": self.name,
+                "start": self.wall_start - _start_time,
+                "wall": wall_end - self.wall_start,
+                "cpu": time.process_time() - self.cpu_start,
+                "children_cpu": _get_children_cpu_time() - self.children_cpu_start,
+                "peak_rss_mb": self.peak_rss_mb,
+                "tid": threading.get_ident(),
+                "args": self.args,
+            }
+        )
+        return False
+
+
+class _NullSpan:
+    """
+    The span returned while profiling is disabled; does nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args) -> _Span | _NullSpan:
+    """
+    Returns a context manager recording a span of the pipeline.
+
+    Example:
+        with profiler.span("image.draw", lines=12):
+            ...
+
+    Args:
+        name: The span name, e.g. "image.draw".
+        **args: Extra details shown with the span in the trace.
+
+    Returns:
+        A context manager, which does nothing if profiling is disabled.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def enable() -> None:
+    """
+    Enables profiling and clears previously recorded spans.
+    """
+    global _enabled, _start_time, _can_reset_peak_rss
+    _events.clear()
+    _start_time = time.perf_counter()
+    _can_reset_peak_rss = reset_peak_rss()
+    _enabled = True
+
+
+def disable() -> None:
+    """
+    Disables profiling; recorded spans are kept until the next `enable()`.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """
+    Returns whether profiling is enabled.
+    """
+    return _enabled
+
+
+def get_summary() -> list[dict]:
+    """
+    Aggregates the recorded spans by name.
+
+    Returns:
+        A list of per-name summaries ("name", "count", "wall", "cpu",
+        "children_cpu" in seconds and the highest "peak_rss_mb" of its spans),
+        slowest first.
+    """
+    summary: dict[str, dict] = {}
+    for event in _events:
+        entry = summary.setdefault(
+            event["name"],
+            {
+                "name": event["name"],
+                "count": 0,
+                "wall": 0.0,
+                "cpu": 0.0,
+                "children_cpu": 0.0,
+                "peak_rss_mb": 0.0,
+            },
+        )
+        entry["count"] += 1
+        entry["wall"] += event["wall"]
+        entry["cpu"] += event["cpu"]
+        entry["children_cpu"] += event["children_cpu"]
+        entry["peak_rss_mb"] = max(entry["peak_rss_mb"], event["peak_rss_mb"])
+    return sorted(summary.values(), key=lambda entry: entry["wall"], reverse=True)
+
+
+def print_summary() -> None:
+    """
+    Prints the recorded spans as a table, aggregated by name.
+    """
+    print(
+        f"{'span':<24} {'count':>6} {'wall (s)':>9} {'mean (ms)':>10} "
+        f"{'cpu (s)':>8} {'child cpu':>10} {'peak RSS (MiB)':>15}"
+    )
+    for entry in get_summary():
+        print(
+            f"{entry['name']:<24} {entry['count']:>6} {entry['wall']:>9.3f} "
+            f"{entry['wall'] / entry['count'] * 1000:>10.2f} {entry['cpu']:>8.3f} "
+            f"{entry['children_cpu']:>10.3f} {entry['peak_rss_mb']:>15.1f}"
+        )
+
+
+def write_trace(trace_path: str) -> None:
+    """
+    Writes the recorded spans as a Chrome trace (JSON), with the summary table
+    under the "summary" key.
+
+    Args:
+        trace_path: The path to write the trace to.
+    """
+    pid = os.getpid()
+    trace_events = [
+        {
+            "name": event["name"],
+            "ph": "X",
+            "ts": round(event["start"] * 1e6),
+            "dur": round(event["wall"] * 1e6),
+            "pid": pid,
+            "tid": event["tid"],
+            "args": {
+                **event["args"],
+                "cpu_ms": round(event["cpu"] * 1000, 3),
+                "children_cpu_ms": round(event["children_cpu"] * 1000, 3),
+                "peak_rss_mb": round(event["peak_rss_mb"], 1),
+            },
+        }
+        for event in _events
+    ]
+    with open(trace_path, "wt", encoding="utf8") as fp:
+        json.dump(
+            {
+                "traceEvents": trace_events,
+                "displayTimeUnit": "ms",
+                "summary": get_summary(),
+            },
+            fp,
+        )
+    logger.info(f"{Status.OK} Profile written to: {trace_path}")
+
+
+def write_report(trace_path: str) -> None:
+    """
+    Writes the Chrome trace and prints the summary table.
+
+    Args:
+        trace_path: The path to write the trace to.
+    """
+    write_trace(trace_path)
+    print_summary()
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache for rendered slide images.
+
+Slides are keyed by a hash of their normalized text, the font file contents
+and the style settings from config.py, so unchanged slides are reused across
+runs instead of being rendered again. The cache is bounded in size and
+evicts the least recently used entries first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import config
+from utils import Status, get_file_digest, prune_directory
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering code changes in a way that affects the output
+RENDER_CACHE_VERSION = 2
+
+# config.py settings that affect how a slide looks
+STYLE_SETTINGS = (
+    "FONT_PATH",
+    "FONT_SIZE",
+    "FONT_VARIANT",
+    "IMAGE_DIMENSION",
+    "IMAGE_PADDING_X",
+    "IMAGE_PADDING_Y",
+    "IMAGE_PADDING_ROW",
+    "IMAGE_TEXT_COLOR",
+    "IMAGE_BACKGROUND_COLOR",
+    "IMAGE_TEXT_ALIGN",
+    "IMAGE_TEXT_WRAP",
+    "IMAGE_OUTPUT_FORMAT",
+    "IMAGE_PNG_COMPRESS_LEVEL",
+)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes slide text the same way it is rendered.
+
+    Leading/trailing blank lines and trailing spaces on each line
+    do not change the rendered image.
+
+    Args:
+        text: The slide text.
+
+    Returns:
+        The normalized text.
+    """
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def get_font_digest() -> str:
+    """
+    Returns the digest of the configured font file.
+
+    Returns:
+        The SHA-256 digest of the font file, or "default" if the font
+        file does not exist (the default font is used in that case).
+    """
+    # Imported here so config validation does not load Pillow
+    import fonts
+
+    font_path = fonts.resolve_font_path(config.FONT_PATH, config.FONT_VARIANT)
+    if not os.path.isfile(font_path):
+        return "default"
+    return get_file_digest(font_path)
+
+
+def get_style_settings() -> dict:
+    """
+    Returns the config.py settings that affect how a slide looks.
+
+    Returns:
+        A dictionary of style settings.
+    """
+    return {name: getattr(config, name) for name in STYLE_SETTINGS}
+
+
+def get_render_key(text: str) -> str:
+    """
+    Computes the cache key of a slide.
+
+    Args:
+        text: The slide text.
+
+    Returns:
+        The hex digest identifying the rendered slide.
+    """
+    payload = json.dumps(
+        {
+            "version": RENDER_CACHE_VERSION,
+            "text": normalize_text(text),
+            "font": get_font_digest(),
+            "style": get_style_settings(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+
+def _get_entry_path(key: str) -> str:
+    """Returns the path of a cache entry, with the extension of its image format."""
+    extension = config.IMAGE_OUTPUT_EXTENSIONS.get(config.IMAGE_OUTPUT_FORMAT, ".png")
+    return os.path.join(config.RENDER_CACHE_DIR, f"{key}{extension}")
+
+
+def restore(key: str, output_path: str) -> bool:
+    """
+    Restores a cached slide to the output path.
+
+    The output file is left untouched when it already matches the cached slide.
+
+    Args:
+        key: The cache key of the slide.
+        output_path: The path the slide should be written to.
+
+    Returns:
+        True if the slide was found in the cache, False otherwise.
+    """
+    entry_path = _get_entry_path(key)
+    if not os.path.isfile(entry_path):
+        return False
+
+    # Mark the entry as recently used
+    os.utime(entry_path)
+    if not _files_are_equal(entry_path, output_path):
+        shutil.copyfile(entry_path, output_path)
+    return True
+
+
+def _files_are_equal(path_a: str, path_b: str) -> bool:
+    """Checks whether two files exist and have the same contents."""
+    if not os.path.isfile(path_b):
+        return False
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, "rb") as fp_a, open(path_b, "rb") as fp_b:
+        return fp_a.read() == fp_b.read()
+
+
+def store(key: str, image_path: str) -> None:
+    """
+    Stores a rendered slide in the cache.
+
+    Args:
+        key: The cache key of the slide.
+        image_path: The path to the rendered slide.
+    """
+    os.makedirs(config.RENDER_CACHE_DIR, exist_ok=True)
+    entry_path = _get_entry_path(key)
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+    shutil.copyfile(image_path, tmp_path)
+    os.replace(tmp_path, entry_path)
+
+
+def prune(max_bytes: int | None = None) -> tuple[int, int]:
+    """
+    Evicts the least recently used entries until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes: The maximum cache size in bytes.
+            Defaults to `RENDER_CACHE_MAX_BYTES`; 0 empties the cache.
+
+    Returns:
+        A tuple of the number of removed entries and the remaining cache size.
+    """
+    if max_bytes is None:
+        max_bytes = config.RENDER_CACHE_MAX_BYTES
+    removed, total_size = prune_directory(
+        config.RENDER_CACHE_DIR,
+        max_bytes,
+        tuple(set(config.IMAGE_OUTPUT_EXTENSIONS.values())),
+    )
+    if removed:
+        logger.info(
+            f"{Status.OK} Render cache: removed {removed} entries, "
+            f"{total_size / 2**20:.1f} MiB left in {config.RENDER_CACHE_DIR}"
+        )
+    return removed, total_size
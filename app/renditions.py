@@ -0,0 +1,136 @@
+"""
+Multi-rendition output.
+
+A job can declare several renditions (e.g. 1080p, 720p and square) in the
+'renditions' section of its configuration file. The configuration is parsed
+once; the slides of each rendition are laid out and rendered at its size
+(sharing the loaded fonts and glyph measurements) into a subfolder named
+after the rendition, and all renditions are encoded by one ffmpeg run that
+reads the audio once and writes `<name>_<rendition>.mp4` next to the video.
+"""
+
+import logging
+import os
+
+import audio_probe
+import config
+import ffmpeg_encoder
+import image
+import profiler
+import timeline
+import validation
+from utils import Status, override_config_settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_rendition_settings(rendition: dict) -> dict:
+    """
+    Returns the config.py settings of a rendition.
+
+    Args:
+        rendition: A rendition from the configuration file.
+
+    Returns:
+        A dictionary of setting names and values.
+    """
+    settings = {"IMAGE_DIMENSION": (rendition["width"], rendition["height"])}
+    if rendition["font_size"]:
+        settings["FONT_SIZE"] = rendition["font_size"]
+        settings["IMAGE_PADDING_ROW"] = round(
+            config.IMAGE_PADDING_ROW * rendition["font_size"] / config.FONT_SIZE
+        )
+    return settings
+
+
+def get_rendition_paths(
+    config_info: validation.GetConfig, rendition: dict
+) -> tuple[list[str], str]:
+    """
+    Returns where the images and the video of a rendition are written.
+
+    Args:
+        config_info: The validated configuration.
+        rendition: A rendition from the configuration file.
+
+    Returns:
+        A tuple of the image paths (in a subfolder named after the rendition)
+        and the video path (`<video name>_<rendition name>.<ext>`).
+    """
+    folder = os.path.join(config_info.folder_path, rendition["name"])
+    image_names = [
+        os.path.join(folder, os.path.relpath(name, config_info.folder_path))
+        for name in config_info.txt_image_names
+    ]
+    video_stem, video_ext = os.path.splitext(config_info.video_file_path)
+    return image_names, f"{video_stem}_{rendition['name']}{video_ext}"
+
+
+def generate_renditions(
+    config_info: validation.GetConfig,
+    generate_image: bool = True,
+    generate_video: bool = True,
+    workers: int | None = None,
+    use_cache: bool | None = None,
+    audio_passthrough: bool | None = None,
+) -> list[str]:
+    """
+    Renders the images of every rendition and encodes all renditions at once.
+
+    Args:
+        config_info: The validated configuration, with its renditions.
+        generate_image: Whether to render the images of each rendition.
+        generate_video: Whether to encode the videos.
+        workers: The number of worker processes used to render images.
+        use_cache: Whether to reuse unchanged images from the render cache.
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+            Defaults to `AUDIO_PASSTHROUGH`.
+
+    Returns:
+        The paths of the videos (empty if no video was generated).
+    """
+    if audio_passthrough is None:
+        audio_passthrough = config.AUDIO_PASSTHROUGH
+
+    outputs = []
+    for rendition in config_info.renditions:
+        image_names, video_path = get_rendition_paths(config_info, rendition)
+        outputs.append((image_names, video_path))
+        if not generate_image:
+            continue
+        logger.info(
+            f"{Status.WIP} Rendition '{rendition['name']}': "
+            f"{rendition['width']}x{rendition['height']}"
+        )
+        for folder in {os.path.dirname(name) for name in image_names}:
+            os.makedirs(folder, exist_ok=True)
+        with override_config_settings(get_rendition_settings(rendition)):
+            with profiler.span("image.generate", rendition=rendition["name"]):
+                image.generate_multiple_text_images(
+                    text_inputs=config_info.txt_image_text,
+                    output_paths=image_names,
+                    workers=workers,
+                    use_cache=use_cache,
+                )
+
+    if not generate_video:
+        return []
+
+    duration_limit = audio_probe.get_audio_duration(config_info.audio_file_path)
+    timelines = [
+        (
+            timeline.build_timeline(
+                image_names, config_info.txt_image_durations, duration_limit
+            ),
+            video_path,
+        )
+        for image_names, video_path in outputs
+    ]
+    with profiler.span("video.encode", encoder="ffmpeg", renditions=len(timelines)):
+        ffmpeg_encoder.encode_renditions(
+            timelines,
+            audio_path=config_info.audio_file_path,
+            duration=duration_limit,
+            audio_passthrough=audio_passthrough,
+        )
+    return [video_path for _, video_path in timelines]
@@ -0,0 +1,441 @@
+"""
+Local render service.
+
+This module keeps a pool of warm worker processes (config, fonts and the
+video libraries loaded once) and accepts render jobs over a local HTTP API,
+on a TCP port or a Unix socket, so callers do not pay for interpreter startup
+and imports on every render.
+
+Usage:
+    python server.py [--host=127.0.0.1] [--port=8765] [--socket=path] [--jobs=N] [--queue-size=N]
+
+API:
+    POST   /jobs        Submit a job: {"config": "path/to/config.yaml"} or
+                        {"yaml": "<inline YAML>", "folder": "path/to/data"},
+                        optionally with "stages": ["image", "video"].
+                        Inline jobs write their images and video to their own
+                        folder, "<folder>/audio2video_jobs/<id>"; jobs submitted
+                        by config path write them next to the config, so jobs
+                        in the same folder run one after another.
+    GET    /jobs        List all jobs.
+    GET    /jobs/<id>   Show a job's status, output path, error and timings.
+    DELETE /jobs/<id>   Cancel a job (running jobs stop after their current stage).
+    GET    /health      Show the service status.
+"""
+
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import batch
+from utils import Status, get_config_settings
+
+logger = logging.getLogger("AudioVideoMaker.server")
+
+
+class QueueFullError(Exception):
+    """Custom exception for jobs rejected because the queue is full."""
+
+    pass
+
+
+class RenderService:
+    """
+    Runs render jobs on a pool of warm worker processes, through a bounded queue.
+    """
+
+    def __init__(self, jobs: int | None = None, queue_size: int = 32) -> None:
+        """
+        Initializes the RenderService and starts its worker processes.
+
+        Args:
+            jobs: The number of jobs rendering at the same time.
+                Defaults to the number of CPU cores.
+            queue_size: The maximum number of queued and running jobs.
+        """
+        self.max_jobs = jobs or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.jobs: dict[str, dict] = {}
+        self._futures: dict[str, Future] = {}
+        # Jobs waiting for the running job of their folder, by folder
+        self._folder_queues: dict[str, deque] = {}
+        # Done callbacks may run right away in the thread holding the lock
+        self._lock = threading.RLock()
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """Starts the pool of worker processes."""
+        cpu_count = os.cpu_count() or 1
+        return ProcessPoolExecutor(
+            max_workers=self.max_jobs,
+            initializer=batch._init_batch_worker,
+            initargs=(get_config_settings(), max(1, cpu_count // self.max_jobs)),
+        )
+
+    def _count_active_jobs(self) -> int:
+        """Returns the number of queued and running jobs."""
+        return sum(
+            job["status"] in ("queued", "running", "cancelling")
+            for job in self.jobs.values()
+        )
+
+    @staticmethod
+    def _get_job_folder(job: dict) -> str | None:
+        """Returns the folder a job writes its outputs to, or None if it has its own."""
+        if job["output_folder"]:
+            return None
+        return os.path.dirname(os.path.abspath(job["config"]))
+
+    def submit(
+        self,
+        config_path: str,
+        stages: tuple[str, ...] = batch.STAGES,
+        temporary: bool = False,
+        output_folder: str | None = None,
+    ) -> dict:
+        """
+        Queues a render job.
+
+        Args:
+            config_path: The path to the job's configuration file.
+            stages: The stages to run ("image" and/or "video").
+            temporary: Whether to delete the configuration file when the job ends.
+            output_folder: A folder to write the job's images and video to,
+                instead of next to the configuration file.
+
+        Returns:
+            The job's status.
+
+        Raises:
+            QueueFullError: If the queue is full.
+            ValueError: If a stage is unknown.
+        """
+        unknown_stages = set(stages) - set(batch.STAGES)
+        if unknown_stages or not stages:
+            raise ValueError(f"Unknown or missing stages: {sorted(unknown_stages)}")
+
+        with self._lock:
+            if self._count_active_jobs() >= self.queue_size:
+                raise QueueFullError(f"Queue is full ({self.queue_size} jobs)")
+            job_id = uuid.uuid4().hex[:12]
+            self.jobs[job_id] = {
+                "id": job_id,
+                "config": config_path,
+                "stages": list(stages),
+                "stage": None,
+                "status": "queued",
+                "output": None,
+                "error": None,
+                "timings": {},
+                "submitted": time.time(),
+                "temporary": temporary,
+                "output_folder": output_folder,
+            }
+            # Jobs in the same folder share image file names (e.g.
+            # `text_image_1.png`), so they run one after another
+            folder = self._get_job_folder(self.jobs[job_id])
+            if folder in self._folder_queues:
+                self._folder_queues[folder].append(job_id)
+            else:
+                if folder is not None:
+                    self._folder_queues[folder] = deque()
+                self._submit_stage(job_id, 0)
+            logger.info(f"{Status.WIP} Job {job_id} queued: {config_path}")
+            return self.get(job_id)
+
+    def _submit_stage(self, job_id: str, stage_index: int) -> None:
+        """Submits a job's stage to the worker pool (the lock must be held)."""
+        job = self.jobs[job_id]
+        job["stage"] = job["stages"][stage_index]
+        stage_args = (job["config"], job["stage"], job["output_folder"])
+        try:
+            future = self._executor.submit(batch._run_stage, *stage_args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed when out of memory); start new workers
+            logger.warning(f"{Status.WARNING} Worker pool broken, restarting it")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            future = self._executor.submit(batch._run_stage, *stage_args)
+        self._futures[job_id] = future
+        future.add_done_callback(
+            lambda done: self._on_stage_done(job_id, stage_index, done)
+        )
+
+    def _on_stage_done(self, job_id: str, stage_index: int, future: Future) -> None:
+        """Records a finished stage and submits the job's next stage."""
+        with self._lock:
+            job = self.jobs[job_id]
+            if future.cancelled():
+                self._finish(job, "cancelled")
+                return
+
+            try:
+                outcome = future.result()
+            except Exception as err:
+                # e.g. BrokenProcessPool if the worker died during the stage
+                outcome = {
+                    "seconds": 0.0,
+                    "output": job["output"],
+                    "error": f"{type(err).__name__}: {err}",
+                }
+            job["timings"][job["stage"]] = outcome["seconds"]
+            job["output"] = outcome["output"]
+            if outcome["error"]:
+                job["error"] = outcome["error"]
+                self._finish(job, "failed")
+            elif job["status"] == "cancelling":
+                self._finish(job, "cancelled")
+            elif stage_index + 1 < len(job["stages"]):
+                self._submit_stage(job_id, stage_index + 1)
+            else:
+                self._finish(job, "done")
+
+    def _finish(self, job: dict, status: str) -> None:
+        """Marks a job as finished (the lock must be held)."""
+        job["status"] = status
+        started = self._futures.pop(job["id"], None) is not None
+        if job["temporary"] and os.path.isfile(job["config"]):
+            os.remove(job["config"])
+        logger.info(f"{Status.OK} Job {job['id']} {status}")
+
+        folder = self._get_job_folder(job)
+        if started and folder is not None:
+            # Start the folder's next waiting job, if any
+            if self._folder_queues[folder]:
+                self._submit_stage(self._folder_queues[folder].popleft(), 0)
+            else:
+                del self._folder_queues[folder]
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        Returns a job's status.
+
+        Args:
+            job_id: The job's id.
+
+        Returns:
+            A dictionary describing the job, or None if there is no such job.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        future = self._futures.get(job_id)
+        if job["status"] == "queued" and future is not None and future.running():
+            job["status"] = "running"
+        del job["temporary"]
+        return job
+
+    def cancel(self, job_id: str) -> dict | None:
+        """
+        Cancels a job. Queued jobs are cancelled right away,
+        running jobs stop after their current stage.
+
+        Args:
+            job_id: The job's id.
+
+        Returns:
+            The job's status, or None if there is no such job.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                future = self._futures.get(job_id)
+                folder = self._get_job_folder(job)
+                if future is None and job_id in self._folder_queues.get(folder, ()):
+                    # Still waiting for its folder, never submitted
+                    self._folder_queues[folder].remove(job_id)
+                    self._finish(job, "cancelled")
+                # The done callback marks the job as cancelled
+                elif future is None or not future.cancel():
+                    job["status"] = "cancelling"
+        return self.get(job_id)
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes, cancelling queued jobs.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP API of the render service.
+    """
+
+    service: RenderService
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def _send_json(self, status_code: int, payload: dict | list) -> None:
+        """Sends a JSON response."""
+        body = json.dumps(payload, indent=2).encode("utf8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_job_id(self) -> str | None:
+        """Returns the job id of a /jobs/<id> path, or None."""
+        parts = self.path.strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/health":
+            self._send_json(
+                200,
+                {
+                    "status": "ok",
+                    "workers": self.service.max_jobs,
+                    "queue_size": self.service.queue_size,
+                    "active_jobs": self.service._count_active_jobs(),
+                },
+            )
+        elif self.path.rstrip("/") == "/jobs":
+            self._send_json(
+                200, [self.service.get(job_id) for job_id in list(self.service.jobs)]
+            )
+        elif job_id := self._get_job_id():
+            job = self.service.get(job_id)
+            (
+                self._send_json(200, job)
+                if job
+                else self._send_json(404, {"error": f"Unknown job: {job_id}"})
+            )
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            stages = tuple(request.get("stages", batch.STAGES))
+            if "config" in request:
+                job = self.service.submit(request["config"], stages)
+            elif "yaml" in request and "folder" in request:
+                # The config is written next to the audio file it refers to, and
+                # the outputs to a folder of their own, so concurrent jobs for
+                # the same folder do not overwrite each other's slides and video
+                job_name = uuid.uuid4().hex
+                config_path = os.path.join(
+                    request["folder"], f".audio2video_job_{job_name}.yaml"
+                )
+                with open(config_path, "wt", encoding="utf8") as fp:
+                    fp.write(request["yaml"])
+                try:
+                    job = self.service.submit(
+                        config_path,
+                        stages,
+                        temporary=True,
+                        output_folder=os.path.join(
+                            request["folder"], "audio2video_jobs", job_name
+                        ),
+                    )
+                except (QueueFullError, ValueError):
+                    # The job was not queued, so nothing else removes its config
+                    os.remove(config_path)
+                    raise
+            else:
+                raise ValueError("Expected a 'config' path or 'yaml' and 'folder'")
+        except QueueFullError as err:
+            self._send_json(503, {"error": str(err)})
+        except (ValueError, TypeError, OSError) as err:
+            self._send_json(400, {"error": str(err)})
+        else:
+            self._send_json(202, job)
+
+    def do_DELETE(self) -> None:
+        job_id = self._get_job_id()
+        job = self.service.cancel(job_id) if job_id else None
+        if job:
+            self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": f"Unknown job: {job_id}"})
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """
+    HTTP server listening on a Unix socket.
+    """
+
+    daemon_threads = True
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: str | None = None,
+    jobs: int | None = None,
+    queue_size: int = 32,
+) -> None:
+    """
+    Starts the render service and serves requests until interrupted.
+
+    Args:
+        host: The host to listen on (ignored with `socket_path`).
+        port: The port to listen on (ignored with `socket_path`).
+        socket_path: The path of a Unix socket to listen on instead of a TCP port.
+        jobs: The number of jobs rendering at the same time.
+        queue_size: The maximum number of queued and running jobs.
+    """
+    service = RenderService(jobs=jobs, queue_size=queue_size)
+    handler = type("Handler", (RenderRequestHandler,), {"service": service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        address = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        address = f"http://{host}:{port}"
+
+    # Stop cleanly when terminated as a background process
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    logger.info(f"{Status.OK} Render service listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info(f"{Status.OK} Render service stopped")
+
+
+if __name__ == "__main__":
+    options = {
+        name.replace("-", "_"): value
+        for name, _, value in (
+            arg[2:].partition("=") for arg in sys.argv[1:] if arg.startswith("--")
+        )
+    }
+    serve(
+        host=options.get("host") or "127.0.0.1",
+        port=int(options.get("port") or 8765),
+        socket_path=options.get("socket") or None,
+        jobs=int(options["jobs"]) if options.get("jobs") else None,
+        queue_size=int(options.get("queue_size") or 32),
+    )
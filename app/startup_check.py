@@ -0,0 +1,154 @@
+"""
+Startup import-time check.
+
+This module measures the time spent importing modules when main.py starts in
+"image" or "test" mode, prints the slowest imports, and fails when the total
+exceeds `STARTUP_IMPORT_BUDGET_MS` or when a module that is only needed for
+videos (e.g. moviepy) gets imported.
+
+Usage:
+    python startup_check.py [--budget=ms] [--runs=N] [--top=N]
+"""
+
+import logging
+import os
+import subprocess
+import sys
+
+import config
+from utils import Status
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("AudioVideoMaker.startup_check")
+
+APP_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_imports(statement: str) -> list[dict]:
+    """
+    Measures the import time of a statement with `python -X importtime`.
+
+    Args:
+        statement: The Python statement to run, e.g. "import main".
+
+    Returns:
+        A list of imported modules, each a dictionary with the module
+        "name", its "depth" in the import tree, and its "self_ms" and
+        "cumulative_ms" import times.
+
+    Raises:
+        RuntimeError: If the statement fails.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_FOLDER,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append(
+            {
+                "name": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return modules
+
+
+def get_total_ms(modules: list[dict]) -> float:
+    """Returns the total import time of the top-level imports."""
+    return sum(module["cumulative_ms"] for module in modules if module["depth"] == 0)
+
+
+def print_report(modules: list[dict], top: int = 10) -> None:
+    """
+    Prints the slowest imports.
+
+    Args:
+        modules: The imported modules returned by `measure_imports`.
+        top: The number of modules to print.
+    """
+    print(f"{'self (ms)':>10} {'cumul. (ms)':>12}  module")
+    slowest = sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)
+    for module in slowest[:top]:
+        indent = "  " * module["depth"]
+        print(
+            f"{module['self_ms']:>10.1f} {module['cumulative_ms']:>12.1f}  "
+            f"{indent}{module['name']}"
+        )
+
+
+def check_startup(budget_ms: float | None = None, runs: int = 3, top: int = 10) -> bool:
+    """
+    Checks the import time and imported modules of main.py's "image" mode.
+
+    The fastest of several runs is used, to reduce noise from the host.
+
+    Args:
+        budget_ms: The import time budget in milliseconds.
+            Defaults to `STARTUP_IMPORT_BUDGET_MS` in config.py.
+        runs: The number of measurements.
+        top: The number of slowest imports to report.
+
+    Returns:
+        True if the startup is within budget and imports no forbidden module.
+    """
+    if budget_ms is None:
+        budget_ms = config.STARTUP_IMPORT_BUDGET_MS
+
+    modules = min(
+        (measure_imports("import main") for _ in range(max(runs, 1))), key=get_total_ms
+    )
+    total_ms = get_total_ms(modules)
+    print_report(modules, top)
+
+    video_ms = get_total_ms(measure_imports("import main, video"))
+    logger.info(f"Video mode imports (for reference): {video_ms:.1f} ms")
+
+    passed = True
+    forbidden = sorted(
+        module["name"]
+        for module in modules
+        if module["name"].split(".")[0] in config.STARTUP_FORBIDDEN_MODULES
+    )
+    if forbidden:
+        logger.error(
+            f"{Status.NOT_OK} Forbidden modules imported in image mode: "
+            f"{', '.join(forbidden[:5])}{' ...' if len(forbidden) > 5 else ''}"
+        )
+        passed = False
+
+    if total_ms > budget_ms:
+        logger.error(
+            f"{Status.NOT_OK} Image mode imports took {total_ms:.1f} ms "
+            f"(budget: {budget_ms} ms)"
+        )
+        passed = False
+    else:
+        logger.info(
+            f"{Status.OK} Image mode imports took {total_ms:.1f} ms "
+            f"(budget: {budget_ms} ms)"
+        )
+    return passed
+
+
+if __name__ == "__main__":
+    options = dict(
+        arg[2:].partition("=")[::2] for arg in sys.argv[1:] if arg.startswith("--")
+    )
+    passed = check_startup(
+        budget_ms=float(options["budget"]) if options.get("budget") else None,
+        runs=int(options.get("runs") or 3),
+        top=int(options.get("top") or 10),
+    )
+    sys.exit(0 if passed else 1)
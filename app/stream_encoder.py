@@ -0,0 +1,335 @@
+"""
+Streaming render-and-encode pipeline.
+
+This module overlaps rendering with encoding: a producer thread renders the
+slides in order into a bounded queue, while the consumer feeds each frame to
+an ffmpeg process (as raw RGB video on its standard input) as soon as it is
+ready. ffmpeg encodes the first slides while later slides are still being
+drawn, so a job takes about as long as its slower stage instead of the sum of
+both, and the queue size caps the number of rendered slides held in memory.
+
+With several render workers, slides are rendered in worker processes into
+reusable shared-memory buffers (see frame_pool.py), which ffmpeg is fed from
+without copying, instead of pickling each frame back to this process.
+"""
+
+import logging
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import audio_probe
+import config
+import ffmpeg_encoder
+import frame_pool
+import image
+import profiler
+import timeline
+from utils import Status, get_config_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _put(frames: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Puts an item in the queue, waiting for room unless the pipeline stops.
+
+    Returns:
+        True if the item was queued, False if the pipeline stopped first.
+    """
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _group_repeated_slides(
+    text_inputs: list[str], output_paths: list[str | None]
+) -> list[tuple[int, str, list[str], int]]:
+    """
+    Groups runs of consecutive slides with the same text, which are rendered
+    once and share their frame.
+
+    Only consecutive slides are grouped, so a frame is dropped as soon as the
+    encoder moves past its run and memory use stays bounded.
+
+    Args:
+        text_inputs: The text of each slide.
+        output_paths: The path to also save each slide to, or None.
+
+    Returns:
+        A list of (index of the first slide, text, paths to save the frame to,
+        number of slides) tuples, one per run.
+    """
+    runs = []
+    for index, (text, output_path) in enumerate(zip(text_inputs, output_paths)):
+        if not runs or runs[-1][1] != text:
+            runs.append((index, text, [], 0))
+        first_index, _, paths, slide_count = runs[-1]
+        if output_path and output_path not in paths:
+            paths.append(output_path)
+        runs[-1] = (first_index, text, paths, slide_count + 1)
+    return runs
+
+
+def _produce_frames(
+    text_inputs: list[str],
+    output_paths: list[str | None],
+    frames: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """
+    Renders the slides in order into the queue, as raw RGB frames.
+
+    Consecutive slides with the same text are rendered once and share a frame.
+    Errors are put in the queue, to be raised by the consumer.
+
+    Args:
+        text_inputs: The text of each slide.
+        output_paths: The path to also save each slide to, or None.
+        frames: The queue to put the frames in.
+        stop: Set by the consumer to stop rendering early.
+    """
+    try:
+        font = image.get_font()
+        for _, text, paths, slide_count in _group_repeated_slides(
+            text_inputs, output_paths
+        ):
+            img = image.render_text_image(text, font=font)
+            for output_path in paths:
+                with profiler.span("image.save"):
+                    image.save_slide(img, output_path)
+            frame = img.tobytes()
+            for _ in range(slide_count):
+                if not _put(frames, frame, stop):
+                    return
+    except Exception as err:
+        _put(frames, err, stop)
+
+
+def _produce_frames_in_workers(
+    text_inputs: list[str],
+    output_paths: list[str | None],
+    frames: queue.Queue,
+    stop: threading.Event,
+    pool: frame_pool.FramePool,
+    workers: int,
+) -> None:
+    """
+    Renders the slides in worker processes into shared-memory frame buffers.
+
+    For each slide, a (future, slot, last use) tuple is put in the queue in
+    slide order; the future completes once the slide was rendered into the
+    buffer of the slot. Consecutive slides with the same text are rendered
+    once and share a slot, which the consumer releases after encoding the
+    last of them. Errors are put in the queue, to be raised by the consumer.
+
+    Args:
+        text_inputs: The text of each slide.
+        output_paths: The path to also save each slide to, or None.
+        frames: The queue to put the rendered slides in.
+        stop: Set by the consumer to stop rendering early.
+        pool: The frame buffers to render into.
+        workers: The number of worker processes.
+    """
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=image._init_render_worker,
+        initargs=(get_config_settings(),),
+    )
+    # Slides waiting for a worker are only cancelled if the pipeline stops early
+    cancel = True
+    try:
+        for index, text, paths, slide_count in _group_repeated_slides(
+            text_inputs, output_paths
+        ):
+            # Waits for the consumer to release a buffer
+            slot = pool.acquire(stop)
+            if slot is None:
+                return
+            future = executor.submit(
+                image._render_shared_frame_worker_task,
+                index,
+                text,
+                paths,
+                pool.get_name(slot),
+            )
+            for repeat in range(slide_count):
+                if not _put(frames, (future, slot, repeat == slide_count - 1), stop):
+                    return
+        cancel = False
+    except Exception as err:
+        _put(frames, err, stop)
+    finally:
+        # Running slides finish before the buffers are freed
+        executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+def _write_frames(
+    stdin, item, frame_count: int, pool: frame_pool.FramePool | None
+) -> None:
+    """
+    Writes a rendered slide from the queue to ffmpeg, `frame_count` times.
+
+    Raises:
+        Exception: The error raised while rendering the slide.
+    """
+    if isinstance(item, Exception):
+        raise item
+    if not isinstance(item, tuple):
+        for _ in range(frame_count):
+            stdin.write(item)
+        return
+
+    future, slot, last_use = item
+    index, error = future.result()
+    if error:
+        raise image.ImageGenerationError(f"Image {index + 1} failed: {error}")
+    frame = pool.view(slot)
+    for _ in range(frame_count):
+        stdin.write(frame)
+    del frame
+    if last_use:
+        pool.release(slot)
+
+
+def encode_streaming(
+    text_inputs: list[str],
+    durations: list[float],
+    audio_path: str,
+    output_path: str,
+    output_paths: list[str] | None = None,
+    audio_passthrough: bool | None = None,
+    queue_size: int | None = None,
+    workers: int | None = None,
+) -> None:
+    """
+    Renders the slides and encodes them into a video with audio, streaming
+    each slide to ffmpeg as soon as it is rendered.
+
+    Args:
+        text_inputs: The text of each slide.
+        durations: A list of durations for each slide (in seconds).
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        output_paths: Optional paths to also save the slide images to.
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+            Defaults to `AUDIO_PASSTHROUGH`.
+        queue_size: The maximum number of rendered slides waiting to be encoded.
+            Defaults to `STREAM_QUEUE_SIZE`.
+        workers: The number of worker processes to render with. Defaults to
+            `IMAGE_RENDER_WORKERS`; slides are rendered in a thread if 1.
+
+    Raises:
+        FFmpegError: If ffmpeg fails.
+        ImageGenerationError: If a slide failed to render in a worker.
+    """
+    if audio_passthrough is None:
+        audio_passthrough = config.AUDIO_PASSTHROUGH
+    queue_size = queue_size or config.STREAM_QUEUE_SIZE
+    workers = workers or config.IMAGE_RENDER_WORKERS
+    output_paths = output_paths or [None] * len(text_inputs)
+
+    duration_limit = audio_probe.get_audio_duration(audio_path)
+    slides = timeline.build_timeline(
+        list(range(len(text_inputs))), durations, duration_limit
+    )
+    frame_counts = timeline.get_frame_counts(slides, config.VIDEO_FPS)
+    width, height = config.IMAGE_DIMENSION
+    cmd = [
+        ffmpeg_encoder.get_ffmpeg_binary(),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-framerate",
+        str(config.VIDEO_FPS),
+        "-i",
+        "pipe:0",
+        "-i",
+        audio_path,
+        "-map",
+        "0:v:0",
+        "-map",
+        "1:a:0",
+        *ffmpeg_encoder.get_video_encoding_args(),
+        *ffmpeg_encoder.get_thread_args(),
+        *ffmpeg_encoder.get_audio_encoding_args(audio_path, audio_passthrough),
+        "-t",
+        f"{duration_limit:.3f}",
+        output_path,
+    ]
+
+    logger.info(
+        f"{Status.WIP} Streaming {len(text_inputs)} slides to ffmpeg "
+        f"(up to {queue_size} slides queued, {workers} render workers)"
+    )
+    frames: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    pool = None
+    if workers > 1:
+        # One more buffer than queued slides, for the slide being encoded
+        pool = frame_pool.FramePool(queue_size + 1, config.IMAGE_DIMENSION)
+        producer = threading.Thread(
+            target=_produce_frames_in_workers,
+            args=(text_inputs, output_paths, frames, stop, pool, workers),
+            name="slide-producer",
+            daemon=True,
+        )
+    else:
+        producer = threading.Thread(
+            target=_produce_frames,
+            args=(text_inputs, output_paths, frames, stop),
+            name="slide-producer",
+            daemon=True,
+        )
+    # ffmpeg's errors go to a file, so a full stderr pipe cannot block it
+    with tempfile.TemporaryFile() as stderr, profiler.span(
+        "video.encode", encoder="streaming", slides=len(text_inputs)
+    ):
+        logger.debug(f"{Status.WIP} Running: {' '.join(cmd)}")
+        process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr
+        )
+        producer.start()
+        try:
+            for frame_count in frame_counts:
+                _write_frames(process.stdin, frames.get(), frame_count, pool)
+            process.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg exited early; its error is reported below
+            pass
+        except BaseException:
+            process.kill()
+            # Reaps ffmpeg before its stderr file is closed
+            process.wait()
+            raise
+        finally:
+            stop.set()
+            producer.join()
+            if pool:
+                pool.close()
+            if not process.stdin.closed:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise ffmpeg_encoder.FFmpegError(
+                f"ffmpeg failed with exit code {process.returncode}:\n"
+                f"{stderr.read().decode(errors='replace')}"
+            )
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
@@ -0,0 +1,278 @@
+"""
+Timed-text output mode.
+
+Instead of drawing every slide into an image, this mode encodes a single
+background frame and adds the slide texts as ASS subtitles, timed on the same
+cumulative timeline as the slides and styled from the font, color, alignment
+and padding settings in config.py. Matroska files carry them as an ASS track
+(with the font file attached). Other containers get a plain mov_text track,
+or the subtitles burned into the frames by libass (`VIDEO_SUBTITLES_BURN_IN`).
+No slide image is rendered or decoded, which encodes far faster than hundreds
+of distinct frames, and a subtitle track also makes much smaller files.
+"""
+
+import logging
+import os
+import tempfile
+
+import audio_probe
+import config
+import ffmpeg_encoder
+import fonts
+import image
+import profiler
+import render_cache
+import timeline
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+# Containers that can carry a styled ASS track; others get mov_text
+ASS_CONTAINERS = (".mkv",)
+
+
+def _format_ass_color(color: tuple[int, int, int]) -> str:
+    """Formats an RGB color as an ASS color (&HAABBGGRR)."""
+    red, green, blue = color[:3]
+    return f"&H00{blue:02X}{green:02X}{red:02X}"
+
+
+def _format_ass_time(seconds: float) -> str:
+    """Formats a time in seconds as an ASS timestamp (H:MM:SS.cc)."""
+    centiseconds = round(seconds * 100)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{centiseconds // 100:02d}.{centiseconds % 100:02d}"
+
+
+def _format_ass_text(text: str) -> str:
+    """
+    Formats slide text as the text of an ASS event.
+
+    Lines are normalized as they are rendered; line breaks, braces and the
+    indentation of left-aligned lines are escaped.
+    """
+    lines = []
+    for line in render_cache.normalize_text(text).split("\n"):
+        line = line.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+        if config.IMAGE_TEXT_ALIGN == "center":
+            line = line.strip()
+        else:
+            indent = len(line) - len(line.lstrip(" "))
+            line = "\\h" * indent + line[indent:]
+        lines.append(line)
+    if not any(lines):
+        return ""
+    # A hard space keeps empty lines at full height
+    return "\\N".join(line or "\\h" for line in lines)
+
+
+def build_subtitles(slides: list[tuple[str, float]]) -> str:
+    """
+    Builds an ASS subtitle document showing each slide's text for its duration.
+
+    Args:
+        slides: A list of (text, duration) tuples.
+
+    Returns:
+        The ASS document.
+    """
+    width, height = config.IMAGE_DIMENSION
+    font = image.get_font()
+    try:
+        font_name = font.getname()[0]
+    except AttributeError:  # The default bitmap font has no name
+        font_name = "Arial"
+    variant = config.FONT_VARIANT or ""
+    try:
+        # ASS font sizes are line heights rather than em sizes
+        font_size = sum(font.getmetrics())
+    except AttributeError:
+        font_size = config.FONT_SIZE
+    bold = -1 if "Bold" in variant else 0
+    italic = -1 if "Italic" in variant else 0
+    # Numpad-style alignment: 4 is middle-left and 5 is middle-center
+    alignment = 5 if config.IMAGE_TEXT_ALIGN == "center" else 4
+
+    document = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        # 2 keeps each line as it is, 0 wraps lines that are too wide
+        f"WrapStyle: {0 if config.IMAGE_TEXT_WRAP else 2}",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, "
+        "OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, "
+        "ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font_name},{font_size},"
+        f"{_format_ass_color(config.IMAGE_TEXT_COLOR)},&H000000FF,"
+        f"{_format_ass_color(config.IMAGE_BACKGROUND_COLOR)},&H00000000,"
+        f"{bold},{italic},0,0,100,100,0,0,1,0,0,{alignment},"
+        f"{config.IMAGE_PADDING_X},{config.IMAGE_PADDING_X},{config.IMAGE_PADDING_Y},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    start = 0.0
+    for text, duration in slides:
+        end = start + duration
+        text = _format_ass_text(text)
+        if text:
+            document.append(
+                f"Dialogue: 0,{_format_ass_time(start)},{_format_ass_time(end)},"
+                f"Default,,0,0,0,,{text}"
+            )
+        start = end
+    return "\n".join(document) + "\n"
+
+
+def get_font_attachment_args(output_path: str) -> list[str]:
+    """
+    Returns the ffmpeg arguments attaching the configured font file to the
+    output, so players render the ASS track with it (Matroska only).
+
+    Args:
+        output_path: The path of the output video.
+
+    Returns:
+        A list of ffmpeg arguments (empty if the font cannot be attached).
+    """
+    font_path = fonts.resolve_font_path(config.FONT_PATH, config.FONT_VARIANT)
+    if not output_path.endswith(ASS_CONTAINERS) or not os.path.isfile(font_path):
+        return []
+    mimetype = (
+        "application/vnd.ms-opentype"
+        if font_path.lower().endswith(".otf")
+        else "application/x-truetype-font"
+    )
+    return ["-attach", font_path, "-metadata:s:t:0", f"mimetype={mimetype}"]
+
+
+def _escape_filter_value(value: str) -> str:
+    """Escapes a filter option value (e.g. a path) for an ffmpeg filtergraph."""
+    # Escaped once for the option parser and once more for the graph parser
+    for special_chars in ("\\':", "\\'[],;"):
+        for char in special_chars:
+            value = value.replace(char, f"\\{char}")
+    return value
+
+
+def get_burn_in_filter(subtitles_path: str) -> str:
+    """
+    Returns the ffmpeg filter burning an ASS subtitle file into the frames,
+    with the configured font.
+
+    Args:
+        subtitles_path: The path to the ASS subtitle file.
+
+    Returns:
+        The video filter.
+    """
+    video_filter = f"ass=filename={_escape_filter_value(subtitles_path)}"
+    font_path = fonts.resolve_font_path(config.FONT_PATH, config.FONT_VARIANT)
+    if os.path.isfile(font_path):
+        font_folder = os.path.dirname(os.path.abspath(font_path))
+        video_filter += f":fontsdir={_escape_filter_value(font_folder)}"
+    return video_filter
+
+
+def encode_timed_text(
+    text_inputs: list[str],
+    durations: list[float],
+    audio_path: str,
+    output_path: str,
+    audio_passthrough: bool | None = None,
+) -> None:
+    """
+    Encodes a video of a single background frame with the slide texts as
+    subtitles, and the audio.
+
+    The subtitles are an ASS track in Matroska files. In other containers they
+    are carried as a plain mov_text track, or burned into the frames if
+    `VIDEO_SUBTITLES_BURN_IN` is set.
+
+    Args:
+        text_inputs: The text of each slide.
+        durations: A list of durations for each slide (in seconds).
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+            Defaults to `AUDIO_PASSTHROUGH`.
+    """
+    if audio_passthrough is None:
+        audio_passthrough = config.AUDIO_PASSTHROUGH
+
+    duration_limit = audio_probe.get_audio_duration(audio_path)
+    slides = timeline.build_timeline(text_inputs, durations, duration_limit)
+    if output_path.endswith(ASS_CONTAINERS):
+        subtitle_codec = "ass"
+    elif config.VIDEO_SUBTITLES_BURN_IN:
+        subtitle_codec = None
+    else:
+        subtitle_codec = "mov_text"
+        logger.warning(
+            f"{Status.WARNING} {os.path.splitext(output_path)[1]} files cannot carry "
+            "styled subtitles: the font, colors, alignment and padding settings are "
+            "not applied. Use a .mkv output, or VIDEO_SUBTITLES_BURN_IN = True."
+        )
+
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        background_path = os.path.join(tmp_dir, "background.png")
+        subtitles_path = os.path.join(tmp_dir, "slides.ass")
+        image.render_text_image("").save(background_path)
+        with open(subtitles_path, "wt", encoding="utf8") as fp:
+            fp.write(build_subtitles(slides))
+
+        video_filter = None
+        if subtitle_codec:
+            logger.info(
+                f"{Status.WIP} Encoding {len(slides)} slides as a {subtitle_codec} "
+                "subtitle track"
+            )
+            subtitle_args = [
+                "-i",
+                subtitles_path,
+                "-map",
+                "0:v:0",
+                "-map",
+                "1:a:0",
+                "-map",
+                "2:s:0",
+                "-c:s",
+                subtitle_codec,
+                *get_font_attachment_args(output_path),
+            ]
+        else:
+            logger.info(
+                f"{Status.WIP} Encoding {len(slides)} slides as burned-in subtitles"
+            )
+            subtitle_args = ["-map", "0:v:0", "-map", "1:a:0"]
+            video_filter = get_burn_in_filter(subtitles_path)
+        with profiler.span("video.encode", encoder="timed_text", slides=len(slides)):
+            ffmpeg_encoder.run_ffmpeg(
+                [
+                    "-loop",
+                    "1",
+                    "-framerate",
+                    str(config.VIDEO_FPS),
+                    "-i",
+                    background_path,
+                    "-i",
+                    audio_path,
+                    *subtitle_args,
+                    *ffmpeg_encoder.get_video_encoding_args(
+                        video_filter=video_filter
+                    ),
+                    *ffmpeg_encoder.get_thread_args(),
+                    *ffmpeg_encoder.get_audio_encoding_args(
+                        audio_path, audio_passthrough
+                    ),
+                    "-t",
+                    f"{duration_limit:.3f}",
+                    output_path,
+                ]
+            )
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
@@ -0,0 +1,105 @@
+"""
+Slide timeline helpers.
+
+This module turns the per-image durations from the configuration into a
+timeline that matches the audio length, independently of the encoder used.
+"""
+
+import logging
+
+from utils import Status
+
+logger = logging.getLogger(__name__)
+
+
+def build_timeline(
+    images: list[str], durations: list[float], duration_limit: float
+) -> list[tuple[str, float]]:
+    """
+    Pairs images with their durations, adjusting the last slide's duration
+    to match the total duration limit.
+
+    Args:
+        images: A list of image paths.
+        durations: A list of durations for each image (in seconds).
+        duration_limit: The total duration of the timeline (in seconds).
+
+    Returns:
+        A list of (image, duration) tuples. `durations` is left unchanged.
+
+    Raises:
+        AssertionError: If the sum of durations (excluding the last one) exceeds the duration limit.
+    """
+    durations = list(durations)
+    # Ensure the sum of durations (excluding the last one) is within the limit
+    assert sum(durations[:-1]) <= duration_limit, (
+        f"Duration limit ({duration_limit}) exceeded by the sum of durations "
+        f"before the last clip: {sum(durations[:-1])}"
+    )
+
+    # Adjust the last clip's duration to fit the limit
+    durations[-1] = duration_limit - sum(durations[:-1])
+
+    logger.info(f"{Status.WIP} Adjusted durations: {durations}")
+    return list(zip(images, durations))
+
+
+def get_frame_counts(timeline: list[tuple[str, float]], fps: float) -> list[int]:
+    """
+    Converts slide durations into whole frame counts.
+
+    Slide boundaries are rounded on the cumulative timeline, so rounding
+    errors do not add up over long videos. A slide shorter than one frame
+    may get no frame at all; a warning is logged, and its time is shown by
+    the next slide, so the total length stays exact.
+
+    Args:
+        timeline: A list of (image, duration) tuples.
+        fps: The video frame rate.
+
+    Returns:
+        The number of frames of each slide.
+    """
+    frame_counts = []
+    start_frame = 0
+    end_time = 0.0
+    for index, (_, duration) in enumerate(timeline):
+        end_time += duration
+        end_frame = round(end_time * fps)
+        frame_counts.append(end_frame - start_frame)
+        if end_frame <= start_frame:
+            logger.warning(
+                f"{Status.WARNING} Slide {index + 1} ({duration:.3f} secs) is shorter "
+                f"than one frame at {fps} fps and is not shown"
+            )
+        start_frame = end_frame
+    return frame_counts
+
+
+def split_timeline(
+    timeline: list[tuple[str, float]], frame_counts: list[int], chunks: int
+) -> list[list[tuple[str, int]]]:
+    """
+    Splits a timeline at slide boundaries into chunks of similar length.
+
+    Slides without frames (see `get_frame_counts`) are dropped.
+
+    Args:
+        timeline: A list of (image, duration) tuples.
+        frame_counts: The number of frames of each slide (see `get_frame_counts`).
+        chunks: The maximum number of chunks.
+
+    Returns:
+        A list of chunks, each a list of (image, frame count) tuples.
+    """
+    target = sum(frame_counts) / max(chunks, 1)
+    parts: list[list[tuple[str, int]]] = [[]]
+    done_frames = 0
+    for (image, _), frame_count in zip(timeline, frame_counts):
+        if frame_count <= 0:
+            continue
+        if parts[-1] and len(parts) < chunks and done_frames >= target * len(parts):
+            parts.append([])
+        parts[-1].append((image, frame_count))
+        done_frames += frame_count
+    return parts
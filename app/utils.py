@@ -1,4 +1,10 @@
+import contextlib
+import functools
+import hashlib
 import logging
+import os
+
+import config
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +22,164 @@ class Status:
     WIP = "[⏳️WIP]"
 
 
+def get_config_settings() -> dict:
+    """
+    Returns a snapshot of the settings defined in the config module.
+
+    Returns:
+        A dictionary of setting names and values.
+    """
+    return {name: getattr(config, name) for name in dir(config) if name.isupper()}
+
+
+def apply_config_settings(settings: dict) -> None:
+    """
+    Applies a snapshot of settings to the config module (e.g. in a worker process).
+
+    Args:
+        settings: A dictionary of setting names and values.
+    """
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+
+@contextlib.contextmanager
+def override_config_settings(settings: dict):
+    """
+    Temporarily applies settings to the config module, restoring them on exit.
+
+    Args:
+        settings: A dictionary of setting names and values.
+    """
+    previous = {name: getattr(config, name) for name in settings}
+    apply_config_settings(settings)
+    try:
+        yield
+    finally:
+        apply_config_settings(previous)
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_file_digest(path: str, mtime_ns: int, size: int) -> str:
+    """Returns the SHA-256 digest of a file (cached by path, mtime and size)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_digest(path: str) -> str:
+    """
+    Returns the SHA-256 digest of a file's contents.
+
+    Digests are cached until the file's modification time or size changes.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The hex digest of the file.
+    """
+    stat = os.stat(path)
+    return _get_file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def prune_directory(
+    folder: str, max_bytes: int, suffix: str | tuple[str, ...] = ""
+) -> tuple[int, int]:
+    """
+    Removes the least recently used files until a folder fits in `max_bytes`.
+
+    Files are ordered by modification time, so caches should touch
+    (`os.utime`) the entries they reuse.
+
+    Args:
+        folder: The folder to prune.
+        max_bytes: The maximum total size of the files in bytes.
+        suffix: Only files ending with this suffix (or one of these suffixes)
+            are considered.
+
+    Returns:
+        A tuple of the number of removed files and the remaining size in bytes.
+    """
+    if not os.path.isdir(folder):
+        return 0, 0
+
+    entries = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(suffix):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in entries)
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+        removed += 1
+    return removed, total_size
+
+
+def get_rss_mb() -> float:
+    """
+    Returns the current resident memory of the process in MiB.
+
+    Unlike `ru_maxrss` (the lifetime peak), this goes down again when memory
+    is returned to the system, including buffers allocated by C extensions
+    such as Pillow.
+
+    Returns:
+        The resident memory in MiB, or 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm", "rt") as fp:
+            resident_pages = int(fp.read().split()[1])
+    except OSError:
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident memory (VmHWM) of the process to its current
+    resident memory.
+
+    Returns:
+        True, or False where this is not supported (it needs Linux).
+    """
+    try:
+        with open("/proc/self/clear_refs", "wt") as fp:
+            fp.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Returns the peak resident memory of the process since the last
+    `reset_peak_rss()` (or since it started) in MiB.
+
+    Returns:
+        The peak resident memory in MiB, or 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status", "rt") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    # VmHWM is in KiB
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
 if __name__ == "__main__":
     logging.basicConfig()
     logger.setLevel(logging.DEBUG)
@@ -30,3 +194,4 @@ if __name__ == "__main__":
     logger.error("error")
     # 50
     logger.critical("critical")
+
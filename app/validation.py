@@ -6,11 +6,19 @@ import os
 import yaml
 from typing import List, Dict, Any
 
+import audio_probe
+import config
+import config_cache
+import profiler
+import render_cache
 from utils import Status
 
 
 logger = logging.getLogger(__name__)
 
+# Use the C-accelerated YAML loader when PyYAML was built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class ConfigValidationError(Exception):
     """Custom exception for configuration validation errors."""
@@ -21,8 +29,24 @@ class ConfigValidationError(Exception):
 class ConfigValidator(Status):
     """
     Validates user input configuration from a YAML file.
+
+    Validated configurations are cached (see config_cache.py), so an unchanged
+    configuration file is neither parsed nor validated again.
     """
 
+    # Attributes restored from the config cache
+    CACHED_ATTRIBUTES = (
+        "config_data",
+        "audio_file_path",
+        "video_file_path",
+        "video_encoder",
+        "audio_duration",
+        "image_durations",
+        "image_texts",
+        "image_names",
+        "renditions",
+    )
+
     def __init__(self, config_file_path: str) -> None:
         """
         Initializes the ConfigValidator.
@@ -36,9 +60,12 @@ class ConfigValidator(Status):
         self.config_data: Dict[str, Any] = {}
         self.audio_file_path: str = ""
         self.video_file_path: str = ""
+        self.video_encoder: str = config.VIDEO_ENCODER
+        self.audio_duration: float = 0.0
         self.image_durations: List[float] = []
         self.image_texts: List[str] = []
         self.image_names: List[str] = []
+        self.renditions: List[Dict[str, Any]] = []
 
         self._validate_config()
 
@@ -46,26 +73,68 @@ class ConfigValidator(Status):
         """
         Validates the entire configuration file.
         """
-        self._read_config()
-        self._validate_audio_section()
-        self._validate_video_section()
-        self._validate_images_section()
+        with profiler.span("config.read"):
+            content = self._read_config_file()
+            cache_key = None
+            if config.CONFIG_CACHE_ENABLED:
+                cache_key = config_cache.get_config_key(self.config_file_path, content)
+                state = config_cache.load(cache_key)
+                if state is not None:
+                    for name, value in state.items():
+                        setattr(self, name, value)
+                    logger.debug(f"{self.OK} Configuration restored from the cache.")
+                    return
+            self._read_config(content)
+        with profiler.span("config.validate"):
+            self._validate_audio_section()
+            self._validate_video_section()
+            self._validate_encoder_section()
+            self._validate_renditions_section()
+            self._validate_images_section()
+            self._deduplicate_images()
+            self._validate_durations()
+        if cache_key:
+            config_cache.store(
+                cache_key,
+                {name: getattr(self, name) for name in self.CACHED_ATTRIBUTES},
+                self.audio_file_path,
+            )
 
-    def _read_config(self) -> None:
+    def _read_config_file(self) -> bytes:
         """
-        Reads the YAML configuration file.
+        Reads the contents of the configuration file.
+
+        Returns:
+            The contents of the file.
 
         Raises:
-            ConfigValidationError: If there is an error reading the file.
+            ConfigValidationError: If the file does not exist.
         """
         try:
-            with open(self.config_file_path, "rt", encoding="utf8") as fp:
-                self.config_data = yaml.safe_load(fp)
-            logger.debug(f"{self.OK} Configuration file loaded successfully.")
+            with open(self.config_file_path, "rb") as fp:
+                return fp.read()
         except FileNotFoundError:
             raise ConfigValidationError(
                 f"Configuration file not found: {self.config_file_path}"
             )
+
+    def _read_config(self, content: bytes) -> None:
+        """
+        Parses the YAML configuration file.
+
+        Args:
+            content: The contents of the configuration file.
+
+        Raises:
+            ConfigValidationError: If there is an error parsing the file.
+        """
+        try:
+            self.config_data = yaml.load(content.decode("utf8"), Loader=YAML_LOADER)
+            logger.debug(f"{self.OK} Configuration file loaded successfully.")
+        except UnicodeDecodeError as err:
+            raise ConfigValidationError(
+                f"Error decoding configuration file: {self.config_file_path}\n{err}"
+            )
         except yaml.YAMLError as err:
             raise ConfigValidationError(
                 f"Error parsing YAML file: {self.config_file_path}\n{err}"
@@ -109,6 +178,82 @@ class ConfigValidator(Status):
             )
         logger.debug(f"{self.OK} Video output path set to: {self.video_file_path}")
 
+    def _validate_encoder_section(self) -> None:
+        """
+        Validates the optional 'encoder' section of the configuration.
+
+        Raises:
+            ConfigValidationError: If the encoder backend is not supported.
+        """
+        if "encoder" not in self.config_data:
+            return
+
+        encoder = self.config_data["encoder"]
+        if encoder not in config.VIDEO_ENCODERS:
+            raise ConfigValidationError(
+                f"Unsupported 'encoder' value '{encoder}' in configuration file: "
+                f"{self.config_file_path} (expected one of {config.VIDEO_ENCODERS})"
+            )
+        self.video_encoder = encoder
+        logger.debug(f"{self.OK} Video encoder set to: {self.video_encoder}")
+
+    def _validate_renditions_section(self) -> None:
+        """
+        Validates the optional 'renditions' section of the configuration.
+
+        Each rendition is a dictionary with a 'name', a 'width' and a 'height'
+        (even numbers, as required by H.264) and an optional 'font_size'.
+
+        Raises:
+            ConfigValidationError: If a rendition is invalid.
+        """
+        if "renditions" not in self.config_data:
+            return
+
+        renditions = self.config_data["renditions"]
+        if not isinstance(renditions, list) or not renditions:
+            raise ConfigValidationError(
+                f"'renditions' must be a non-empty list in configuration file: "
+                f"{self.config_file_path}"
+            )
+        for index, rendition in enumerate(renditions):
+            if not isinstance(rendition, dict):
+                raise ConfigValidationError(
+                    f"Rendition at index {index} must be a mapping"
+                )
+            name = str(rendition.get("name", ""))
+            if not name or not all(c.isalnum() or c in "-_" for c in name):
+                raise ConfigValidationError(
+                    f"Rendition at index {index} needs a 'name' made of letters, "
+                    f"digits, '-' or '_'"
+                )
+            if any(r["name"] == name for r in self.renditions):
+                raise ConfigValidationError(f"Duplicate rendition name '{name}'")
+            for key in ("width", "height"):
+                value = rendition.get(key)
+                if not isinstance(value, int) or value <= 0 or value % 2:
+                    raise ConfigValidationError(
+                        f"'{key}' must be a positive even number in rendition '{name}'"
+                    )
+            font_size = rendition.get("font_size")
+            if font_size is not None and (
+                not isinstance(font_size, int) or font_size <= 0
+            ):
+                raise ConfigValidationError(
+                    f"'font_size' must be a positive number in rendition '{name}'"
+                )
+            self.renditions.append(
+                {
+                    "name": name,
+                    "width": rendition["width"],
+                    "height": rendition["height"],
+                    "font_size": font_size,
+                }
+            )
+        logger.debug(
+            f"{self.OK} Renditions: {', '.join(r['name'] for r in self.renditions)}"
+        )
+
     def _validate_images_section(self) -> None:
         """
         Validates the 'images' section of the configuration.
@@ -121,19 +266,25 @@ class ConfigValidator(Status):
                 f"Missing 'images' section in configuration file: {self.config_file_path}"
             )
 
+        # Formatting the debug messages is costly for thousands of slides
+        debug = logger.isEnabledFor(logging.DEBUG)
         for i, image_record in enumerate(self.config_data["images"]):
-            logger.debug(
-                f"{self.WIP} ({i}) Validating image data: {str(image_record)[:50]}..."
-            )
-            self._validate_image_record(image_record, i)
-
-    def _validate_image_record(self, image_record: Dict[str, Any], index: int) -> None:
+            if debug:
+                logger.debug(
+                    f"{self.WIP} ({i}) Validating image data: {str(image_record)[:50]}..."
+                )
+            self._validate_image_record(image_record, i, debug)
+
+    def _validate_image_record(
+        self, image_record: Dict[str, Any], index: int, debug: bool = True
+    ) -> None:
         """
         Validates a single image record.
 
         Args:
             image_record: The image record to validate.
             index: The index of the image record.
+            debug: Whether to log the record's data.
 
         Raises:
             ConfigValidationError: If the image record is invalid.
@@ -154,9 +305,16 @@ class ConfigValidator(Status):
         self.image_texts.append(image_record["text"])
         self.image_durations.append(float(image_record["duration"]))
 
-        image_name = image_record.get("name", f"text_image_{index + 1}.png")
+        image_extension = config.IMAGE_OUTPUT_EXTENSIONS.get(
+            config.IMAGE_OUTPUT_FORMAT, ".png"
+        )
+        image_name = image_record.get(
+            "name", f"text_image_{index + 1}{image_extension}"
+        )
         image_path = os.path.join(self.folder_path, image_name)
         self.image_names.append(image_path)
+        if not debug:
+            return
         logger.debug(
             f"{self.WIP} Image {index} text: {str(image_record['text'])[:50]}..."
         )
@@ -164,6 +322,61 @@ class ConfigValidator(Status):
         logger.debug(f"{self.WIP} Image {index} name: {image_path}")
         logger.debug(f"{self.OK} Image {index} data validated.")
 
+    def _deduplicate_images(self) -> None:
+        """
+        Points slides that render the same image to the first one's image file,
+        so repeated slides are rendered and decoded only once.
+
+        All slides share the same font and style settings, so slides with the
+        same normalized text render the same image; the font file is only
+        hashed by the render cache. Slides with an explicit 'name' keep their
+        own image file.
+        """
+        if not config.IMAGE_DEDUPLICATE:
+            return
+
+        first_image_names: Dict[str, str] = {}
+        for index, image_record in enumerate(self.config_data["images"]):
+            if "name" in image_record:
+                continue
+            text = render_cache.normalize_text(str(image_record["text"]))
+            self.image_names[index] = first_image_names.setdefault(
+                text, self.image_names[index]
+            )
+
+        duplicates = len(self.image_names) - len(set(self.image_names))
+        if duplicates:
+            logger.info(
+                f"{self.OK} {duplicates} repeated slides reuse the image of an earlier slide"
+            )
+
+    def _validate_durations(self) -> None:
+        """
+        Validates the image durations against the audio length.
+
+        The last image is stretched or shortened to the end of the audio,
+        so only the images before it must fit within the audio.
+
+        Raises:
+            ConfigValidationError: If the audio length cannot be read or the
+                image durations exceed it.
+        """
+        try:
+            self.audio_duration = audio_probe.get_audio_duration(self.audio_file_path)
+        except audio_probe.AudioProbeError as err:
+            raise ConfigValidationError(str(err))
+
+        total_duration = sum(self.image_durations[:-1])
+        if total_duration > self.audio_duration:
+            raise ConfigValidationError(
+                f"Image durations before the last image ({total_duration:.2f} secs) "
+                f"exceed the audio duration ({self.audio_duration:.2f} secs) "
+                f"in configuration file: {self.config_file_path}"
+            )
+        logger.debug(
+            f"{self.OK} Image durations fit in the audio ({self.audio_duration:.2f} secs)"
+        )
+
     def show_config(self) -> None:
         """
         Displays the loaded configuration.
@@ -172,6 +385,9 @@ class ConfigValidator(Status):
         logger.debug(f"Configuration file path: {self.config_file_path}")
         logger.debug(f"Audio input path: {self.audio_file_path}")
         logger.debug(f"Video output path: {self.video_file_path}")
+        logger.debug(f"Video encoder: {self.video_encoder}")
+        logger.debug(f"Renditions: {self.renditions}")
+        logger.debug(f"Audio duration: {self.audio_duration}")
         logger.debug(f"Image text durations: {self.image_durations}")
         logger.debug(f"Image file names: {self.image_names}")
         logger.debug("----" * 12)
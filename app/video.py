@@ -1,20 +1,36 @@
+import bisect
+import itertools
 import os
 import logging
-
-from moviepy import ImageClip, AudioFileClip, CompositeVideoClip, concatenate_videoclips
-
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from moviepy import (
+    ImageClip,
+    AudioFileClip,
+    CompositeVideoClip,
+    VideoClip,
+    concatenate_videoclips,
+)
+from PIL import Image
+
+import audio_probe
 import config
-from utils import Status
+import ffmpeg_encoder
+import profiler
+import timeline
+from utils import Status, apply_config_settings, get_config_settings
 
 logger = logging.getLogger(__name__)
 
 
-def get_image_clip(image_path: str, duration: float) -> ImageClip:
+def get_image_clip(image_path: str | np.ndarray, duration: float) -> ImageClip:
     """
-    Creates an ImageClip from an image file.
+    Creates an ImageClip from an image file or an in-memory RGB array.
 
     Args:
-        image_path: The path to the image file.
+        image_path: The path to the image file, or an RGB array.
         duration: The duration of the image clip in seconds.
 
     Returns:
@@ -23,11 +39,78 @@ def get_image_clip(image_path: str, duration: float) -> ImageClip:
     Raises:
         FileNotFoundError: If the image file does not exist.
     """
+    if isinstance(image_path, np.ndarray):
+        return ImageClip(image_path, duration=duration)
     if not os.path.isfile(image_path):
         raise FileNotFoundError(f"Image file not found: {image_path}")
     return ImageClip(image_path, duration=duration)
 
 
+def load_frame(image_path: str | np.ndarray) -> np.ndarray:
+    """
+    Decodes an image file into an RGB array.
+
+    Args:
+        image_path: The path to the image file, or an RGB array (returned as is).
+
+    Returns:
+        An RGB array (height x width x 3).
+    """
+    if isinstance(image_path, np.ndarray):
+        return image_path
+    with Image.open(image_path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def _is_same_image(image: str | np.ndarray, other: str | np.ndarray | None) -> bool:
+    """Whether two slides show the same image file or in-memory array."""
+    if isinstance(image, np.ndarray) or isinstance(other, np.ndarray):
+        return image is other
+    return image == other
+
+
+class LazySlideClip(VideoClip):
+    """
+    A video clip that shows slides one after another, decoding each slide
+    only when the encoder reaches it and dropping it afterwards.
+
+    Only one decoded slide is held in memory, whatever the number of slides.
+    """
+
+    def __init__(self, slides: list[tuple[str | np.ndarray, float]]) -> None:
+        """
+        Initializes the LazySlideClip.
+
+        Args:
+            slides: A list of (image, duration) tuples.
+
+        Raises:
+            FileNotFoundError: If an image file does not exist.
+        """
+        for image_path, _ in slides:
+            if not isinstance(image_path, np.ndarray) and not os.path.isfile(
+                image_path
+            ):
+                raise FileNotFoundError(f"Image file not found: {image_path}")
+
+        self.images = [image_path for image_path, _ in slides]
+        durations = [duration for _, duration in slides]
+        self.start_times = list(itertools.accumulate(durations, initial=0.0))[:-1]
+        self._frame_source: str | np.ndarray | None = None
+        self._frame: np.ndarray | None = None
+        super().__init__(frame_function=self._get_slide_frame, duration=sum(durations))
+
+    def _get_slide_frame(self, t: float) -> np.ndarray:
+        """Returns the frame of the slide shown at time `t`."""
+        index = max(bisect.bisect_right(self.start_times, t) - 1, 0)
+        source = self.images[index]
+        if not _is_same_image(source, self._frame_source):
+            # Replacing the frame releases the previous slide
+            self._frame = load_frame(source)
+            self._frame_source = source
+        return self._frame
+
+
 def get_audio_clip(audio_path: str) -> AudioFileClip:
     """
     Creates an AudioFileClip from an audio file.
@@ -47,14 +130,16 @@ def get_audio_clip(audio_path: str) -> AudioFileClip:
 
 
 def get_multiple_image_clips(
-    images: list[str], durations: list[float], duration_limit: float
+    images: list[str | np.ndarray], durations: list[float], duration_limit: float
 ) -> list[ImageClip]:
     """
     Combines multiple images into a list of ImageClips, adjusting the last clip's duration
     to match the total duration limit.
 
+    Each image file is decoded once and its frame is shared by all slides showing it.
+
     Args:
-        images: A list of image paths.
+        images: A list of image paths or in-memory RGB arrays.
         durations: A list of durations for each image (in seconds).
         duration_limit: The maximum allowed total duration for the combined clips (in seconds).
 
@@ -65,57 +150,242 @@ def get_multiple_image_clips(
         AssertionError: If the sum of durations (excluding the last one) exceeds the duration limit.
     """
     clips: list[ImageClip] = []
+    frames: dict[str, np.ndarray] = {}
     total_duration = 0
 
-    # Ensure the sum of durations (excluding the last one) is within the limit
-    assert sum(durations[:-1]) <= duration_limit, (
-        f"Duration limit ({duration_limit}) exceeded by the sum of durations "
-        f"before the last clip: {sum(durations[:-1])}"
-    )
-
-    # Adjust the last clip's duration to fit the limit
-    durations[-1] = duration_limit - sum(durations[:-1])
-
-    logger.info(f"{Status.WIP} Adjusted durations: {durations}")
-
-    for img, dur in zip(images, durations):
+    for img, dur in timeline.build_timeline(images, durations, duration_limit):
         total_duration += dur
         logger.debug(
             f"{Status.WIP} Preparing video clips: {total_duration:.2f} (secs) out of {duration_limit:.2f} (secs)"
         )
+        if not isinstance(img, np.ndarray):
+            if img not in frames:
+                if not os.path.isfile(img):
+                    raise FileNotFoundError(f"Image file not found: {img}")
+                frames[img] = load_frame(img)
+            img = frames[img]
         clips.append(get_image_clip(img, dur))
 
     return clips
 
 
 def generate_video_with_audio(
-    images: list[str],
+    images: list[str | np.ndarray],
     durations: list[float],
     audio_path: str,
     output_path: str,
+    encoder: str | None = None,
+    audio_passthrough: bool | None = None,
+    encode_jobs: int | None = None,
 ) -> None:
     """
     Generates a video by combining multiple images with audio.
 
     Args:
-        images: A list of image paths.
+        images: A list of image paths, or in-memory RGB arrays
+            (only supported by the "moviepy" encoder).
         durations: A list of durations for each image (in seconds).
         audio_path: The path to the audio file.
         output_path: The path to save the generated video.
+        encoder: The encoder backend to use ("moviepy", "ffmpeg" or "incremental").
+            Defaults to `VIDEO_ENCODER`.
+        audio_passthrough: Whether to copy the audio stream without re-encoding
+            when its codec fits in MP4. Defaults to `AUDIO_PASSTHROUGH`.
+        encode_jobs: The number of processes to encode with, each encoding a
+            chunk of the timeline. Defaults to `VIDEO_ENCODE_JOBS`.
+
+    Raises:
+        ValueError: If the encoder backend is not supported, or in-memory
+            images are given with another encoder or more than one encode job.
     """
+    encoder = encoder or config.VIDEO_ENCODER
+    if encoder not in config.VIDEO_ENCODERS:
+        raise ValueError(
+            f"Unsupported encoder '{encoder}', expected one of {config.VIDEO_ENCODERS}"
+        )
+
+    if encoder != "moviepy" and any(isinstance(img, np.ndarray) for img in images):
+        raise ValueError(f"The '{encoder}' encoder needs image files as input")
+
+    if encoder in ffmpeg_encoder.FFMPEG_ENCODERS:
+        ffmpeg_encoder.encode_video(
+            images,
+            durations,
+            audio_path=audio_path,
+            output_path=output_path,
+            encoder=encoder,
+            audio_passthrough=audio_passthrough,
+            encode_jobs=encode_jobs,
+        )
+        return
+
+    if audio_passthrough is None:
+        audio_passthrough = config.AUDIO_PASSTHROUGH
+    encode_jobs = encode_jobs or config.VIDEO_ENCODE_JOBS
+    # Chunk processes would each get a pickled copy of every frame
+    if encode_jobs > 1 and any(isinstance(img, np.ndarray) for img in images):
+        raise ValueError("Chunks encoded in parallel need image files as input")
+
+    # Read the duration from the audio headers, without opening a decoder
+    duration_limit = audio_probe.get_audio_duration(audio_path)
+    if encode_jobs > 1:
+        with profiler.span("video.encode", encoder=encoder, jobs=encode_jobs):
+            encode_video_in_chunks(
+                timeline.build_timeline(images, durations, duration_limit),
+                audio_path=audio_path,
+                output_path=output_path,
+                duration=duration_limit,
+                encoder=encoder,
+                audio_passthrough=audio_passthrough,
+                jobs=encode_jobs,
+            )
+        return
+
+    with profiler.span("video.clips", slides=len(images)):
+        if config.VIDEO_LAZY_CLIPS:
+            video_clip = LazySlideClip(
+                timeline.build_timeline(images, durations, duration_limit)
+            )
+        else:
+            image_clips = get_multiple_image_clips(
+                images, durations, duration_limit=duration_limit
+            )
+            video_clip = concatenate_videoclips(image_clips)
+
+    if audio_passthrough:
+        # Write the video track only, then mux in the audio stream with ffmpeg
+        with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+            video_path = os.path.join(tmp_dir, "video.mp4")
+            with profiler.span("video.encode", encoder=encoder):
+                video_clip.write_videofile(
+                    video_path,
+                    codec="libx264",
+                    audio=False,
+                    fps=config.VIDEO_FPS,
+                    preset=config.VIDEO_PRESET,
+                    threads=config.VIDEO_ENCODE_THREADS,
+                )
+            ffmpeg_encoder.mux_audio(
+                video_path, audio_path, output_path, duration_limit, True
+            )
+        logger.info(f"{Status.OK} Video file created at: {output_path}")
+        return
+
     audio_clip = get_audio_clip(audio_path)
-    image_clips = get_multiple_image_clips(
-        images, durations, duration_limit=audio_clip.duration
-    )
-    final_clip = concatenate_videoclips(image_clips).with_audio(audio_clip)
+    final_clip = video_clip.with_audio(audio_clip)
+
+    # moviepy encodes the audio and muxes it in while writing the video
+    with profiler.span("video.encode", encoder=encoder):
+        final_clip.write_videofile(
+            output_path,
+            codec="libx264",
+            audio_codec="aac",
+            fps=config.VIDEO_FPS,
+            preset=config.VIDEO_PRESET,
+            threads=config.VIDEO_ENCODE_THREADS,
+            # Keep moviepy's temporary audio file next to the output (not in the
+            # working directory), so concurrent jobs do not overwrite each other's
+            temp_audiofile_path=os.path.dirname(output_path),
+        )
+    logger.info(f"{Status.OK} Video file created at: {output_path}")
 
-    final_clip.write_videofile(
+
+def _encode_moviepy_chunk(
+    slides: list[tuple[str | np.ndarray, int]], output_path: str, threads: int
+) -> str:
+    """
+    Encodes a chunk of the timeline with moviepy (without audio).
+
+    Args:
+        slides: A list of (image, frame count) tuples.
+        output_path: The path to save the chunk.
+        threads: The number of threads ffmpeg may use.
+
+    Returns:
+        The path to the chunk.
+    """
+    if config.VIDEO_LAZY_CLIPS:
+        video_clip = LazySlideClip(
+            [(img, frames / config.VIDEO_FPS) for img, frames in slides]
+        )
+    else:
+        clips = [
+            get_image_clip(img, frames / config.VIDEO_FPS) for img, frames in slides
+        ]
+        video_clip = concatenate_videoclips(clips)
+    video_clip.write_videofile(
         output_path,
         codec="libx264",
-        audio_codec="aac",
+        audio=False,
         fps=config.VIDEO_FPS,
-        preset="faster",
+        preset=config.VIDEO_PRESET,
+        threads=threads,
+        logger=None,
     )
+    return output_path
+
+
+def encode_video_in_chunks(
+    slides: list[tuple[str | np.ndarray, float]],
+    audio_path: str,
+    output_path: str,
+    duration: float,
+    encoder: str,
+    audio_passthrough: bool,
+    jobs: int,
+) -> None:
+    """
+    Encodes a timeline in parallel, one chunk of slides per process.
+
+    The timeline is split at slide boundaries, each chunk is encoded in its own
+    process with an even share of the CPU threads, then the chunks are joined
+    without re-encoding and the audio is muxed in once.
+
+    Args:
+        slides: A list of (image, duration) tuples (see `timeline.build_timeline`).
+        audio_path: The path to the audio file.
+        output_path: The path to save the generated video.
+        duration: The total duration of the video (in seconds).
+        encoder: The encoder backend to encode the chunks with ("moviepy" or "ffmpeg").
+        audio_passthrough: Whether to copy compatible audio without re-encoding.
+        jobs: The number of chunks to encode at the same time.
+    """
+    if encoder == "ffmpeg":
+        ffmpeg_encoder.encode_slideshow_in_chunks(
+            slides, audio_path, output_path, duration, audio_passthrough, jobs
+        )
+        return
+
+    frame_counts = timeline.get_frame_counts(slides, config.VIDEO_FPS)
+    chunks = timeline.split_timeline(slides, frame_counts, jobs)
+
+    with tempfile.TemporaryDirectory(prefix="audio2video_") as tmp_dir:
+        threads = ffmpeg_encoder.get_encode_threads(jobs)
+        logger.info(
+            f"{Status.WIP} Encoding {len(chunks)} chunks in parallel with moviepy "
+            f"({threads} threads each)"
+        )
+        chunk_paths = [
+            os.path.join(tmp_dir, f"chunk_{i:04d}.mp4") for i in range(len(chunks))
+        ]
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=apply_config_settings,
+            initargs=(get_config_settings(),),
+        ) as executor:
+            list(
+                executor.map(
+                    _encode_moviepy_chunk,
+                    chunks,
+                    chunk_paths,
+                    [threads] * len(chunks),
+                )
+            )
+
+        logger.info(f"{Status.WIP} Joining {len(chunk_paths)} chunks")
+        ffmpeg_encoder.concat_segments(
+            chunk_paths, audio_path, output_path, duration, audio_passthrough
+        )
     logger.info(f"{Status.OK} Video file created at: {output_path}")
 
 
@@ -128,11 +398,12 @@ def combine_audio_and_image(image_path: str, audio_path: str, output_path: str)
         audio_path: The path to the audio file.
         output_path: The path to save the generated video.
     """
-    audio_clip = get_audio_clip(audio_path)
-    mins, secs = divmod(audio_clip.duration, 60)
+    audio_duration = audio_probe.get_audio_duration(audio_path)
+    mins, secs = divmod(audio_duration, 60)
     logger.info(f"Audio file duration: {int(mins)} mins {secs:.2f} secs")
 
-    image_clip = get_image_clip(image_path, duration=audio_clip.duration)
+    image_clip = get_image_clip(image_path, duration=audio_duration)
+    audio_clip = get_audio_clip(audio_path)
     final_clip = CompositeVideoClip(clips=[image_clip]).with_audio(audio_clip)
 
     final_clip.write_videofile(
@@ -140,7 +411,7 @@ def combine_audio_and_image(image_path: str, audio_path: str, output_path: str)
         codec="libx264",
         audio_codec="aac",
         fps=config.VIDEO_FPS,
-        preset="faster",
+        preset=config.VIDEO_PRESET,
     )
     logger.info(f"{Status.OK} Video file created at: {output_path}")
 